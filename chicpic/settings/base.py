@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites', # need for allauth
+    'django.contrib.postgres',
 
     # 3rd Party Apps
     'rest_framework',
@@ -55,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PrometheusMetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,6 +126,62 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Catalog responses are cached in-process (LRU) by default. Use a shared backend to share them between workers,
+# e.g. django.core.cache.backends.redis.RedisCache (requires redis) with the server URL as location.
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_BACKEND = config('CATALOG_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    CATALOG_CACHE_ALIAS: {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': config('CATALOG_CACHE_LOCATION', default='catalog'),
+        'TIMEOUT': config('CATALOG_CACHE_TIMEOUT', default=60 * 60, cast=int),
+    },
+}
+
+if CATALOG_CACHE_BACKEND == 'django.core.cache.backends.locmem.LocMemCache':
+    CACHES[CATALOG_CACHE_ALIAS]['OPTIONS'] = {
+        'MAX_ENTRIES': config('CATALOG_CACHE_MAX_ENTRIES', default=5000, cast=int),
+    }
+
+# Best-fit recommendations are ranked by a window query in PostgreSQL ('sql'), scored in each worker with NumPy
+# ('numpy'), or served from the best-fit variants precomputed per size profile ('profiles', see clothing.fitting)
+FIT_SCORING_BACKEND = config('FIT_SCORING_BACKEND', default='sql')
+# Users whose measurements are equal after rounding to this step (cm) share cached best-fit results
+FIT_CACHE_MEASUREMENT_STEP = config('FIT_CACHE_MEASUREMENT_STEP', default=2, cast=float)
+
+# Share of the requests profiled in the Server-Timing header (DB queries, serializer and render time), and whether
+# the profiles are logged as JSON lines too (see core.middleware.ServerTimingMiddleware). The header exposes
+# internals and the profiling has a cost, so it is off unless enabled.
+SERVER_TIMING_SAMPLE_RATE = config('SERVER_TIMING_SAMPLE_RATE', default=0, cast=float)
+SERVER_TIMING_LOG = config('SERVER_TIMING_LOG', default=False, cast=bool)
+
+# Bearer token of the Prometheus scrapes of /metrics, which is also open to staff users
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'chicpic.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
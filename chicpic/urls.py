@@ -18,10 +18,13 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('user.urls')),
     path('clothing/', include('clothing.urls')),
+    path('metrics', metrics, name='metrics'),
     path('accounts/', include('allauth.urls')), # It is only added for some reverse() calls in dj-rest-auth package
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
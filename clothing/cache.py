@@ -0,0 +1,138 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.metrics import record_cache_lookup
+from .fitting import MEASUREMENT_USER_FIELDS
+from .models import CatalogVersion
+
+
+def get_catalog_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_fit_profile_key(user_additional):
+    """
+    Measurements of the user rounded to FIT_CACHE_MEASUREMENT_STEP (shoe size to half sizes) and the gender they
+    are interested in. Users with near-identical measurements share the key, and so the cached best-fit results.
+    """
+    parts = [user_additional.gender_interested]
+    for _, user_field in MEASUREMENT_USER_FIELDS:
+        value = getattr(user_additional, user_field)
+        step = 0.5 if user_field == 'shoe_size' else settings.FIT_CACHE_MEASUREMENT_STEP
+        parts.append('' if value is None else f'{round(float(value) / step) * step:g}')
+    return ':'.join(parts)
+
+
+def get_fit_profile_version(profile_key):
+    return get_catalog_cache().get_or_set(f'fit-profile:{profile_key}', uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_fit_profile(user_additional):
+    """Drops the cached best-fit results of the size profile of the user."""
+    get_catalog_cache().set(f'fit-profile:{get_fit_profile_key(user_additional)}', uuid.uuid4().hex, timeout=None)
+
+
+def make_etag(*parts):
+    """Strong entity tag built from everything the response body depends on."""
+    return '"%s"' % hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def get_settled_last_modified(last_modified):
+    """
+    HTTP dates have a 1 second granularity, so a Last-Modified within the current second could be sent with a
+    response that a later change in the same second makes stale, and If-Modified-Since would then keep answering
+    304 for it. Such a time is left out until the second has passed, and the ETag is the only validator.
+    """
+    if last_modified is None or int(last_modified.timestamp()) >= int(timezone.now().timestamp()):
+        return None
+    return last_modified
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    last_modified = get_settled_last_modified(last_modified)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """
+    Evaluates the request preconditions (If-None-Match, If-Modified-Since, ...) against the validators.
+    Returns a 304 (or 412) response when the view does not have to build the response, otherwise None.
+
+    If-Modified-Since is ignored when If-None-Match is present (RFC 9110, 13.2.2), the ETag is built from the
+    version and is the authoritative validator.
+    """
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        last_modified = None
+    last_modified = get_settled_last_modified(last_modified)
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class CatalogCacheMixin:
+    """
+    Caches the response data of the catalog list views that are not personalized.
+
+    Cache keys contain the catalog version and token of the view scope, which the integrator bumps on every run, so
+    cached responses never outlive the data they were built from. Until the first integration there is no
+    version to invalidate entries with, so nothing is cached.
+
+    The same version is the validator of conditional requests: responses carry a strong ETag and the time of the
+    last version change as Last-Modified (once that second has passed), and a matching If-None-Match is answered
+    with 304 before any queryset is evaluated.
+    """
+
+    def get_catalog_scope(self):
+        return CatalogVersion.GLOBAL_SCOPE
+
+    def is_response_cacheable(self):
+        return True
+
+    def get_response_cache_key(self, catalog_version: CatalogVersion):
+        request = self.request
+        query = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+        kwargs = sorted(self.kwargs.items())
+        raw_key = f'{request.get_host()}:{request.path}:{query}:{kwargs}'
+        return f'catalog:{self.__class__.__name__}:{catalog_version.scope}:{catalog_version.version}:' \
+               f'{catalog_version.token.hex}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_response_cacheable():
+            return super().list(request, *args, **kwargs)
+
+        catalog_version = CatalogVersion.get_version(self.get_catalog_scope())
+        if catalog_version is None:
+            return super().list(request, *args, **kwargs)
+
+        cache = get_catalog_cache()
+        cache_key = self.get_response_cache_key(catalog_version)
+
+        etag = make_etag(cache_key, request.accepted_renderer.format)
+        not_modified = get_not_modified_response(request, etag, catalog_version.updated_at)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(cache_key)
+        record_cache_lookup('catalog_response', hit=data is not None)
+        if data is not None:
+            return set_validators(Response(data), etag, catalog_version.updated_at)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+        cache.set(cache_key, response.data)
+        return set_validators(response, etag, catalog_version.updated_at)
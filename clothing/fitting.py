@@ -0,0 +1,208 @@
+import threading
+
+import numpy as np
+
+from user.models import UserAdditional, GenderChoices
+from .models import Product, Variant, CatalogVersion, SizeProfile, BestFitVariant
+
+
+# Variant measurement field -> UserAdditional field
+MEASUREMENT_USER_FIELDS = (
+    ('shoulder', 'shoulder_size'),
+    ('bust', 'bust_size'),
+    ('chest', 'chest_size'),
+    ('waist', 'waist_size'),
+    ('hips', 'hips_size'),
+    ('inseam', 'inseam'),
+    ('shoe_size', 'shoe_size'),
+)
+
+
+class FitScoringEngine:
+    """
+    Scores the variants of the live catalog against a user profile in process, with NumPy.
+
+    The variants of the products that are not deleted are loaded into flat arrays, sorted by product. Scoring is
+    one L1 distance over the measurement matrix, where missing variant measurements count as 0 and variants
+    without any comparable measurement come last, followed by a per-product argmin. This gives the same best-fit
+    variants as the SQL window query in views.get_best_fit_variant.
+    """
+
+    def __init__(self, catalog_version=None, product_ids=None):
+        self.catalog_version = catalog_version
+
+        variants = Variant.objects.filter(product__is_deleted=False)
+        product_categories = Product.categories.through.objects.filter(product__is_deleted=False)
+        # Load part of the catalog only
+        if product_ids is not None:
+            variants = variants.filter(product_id__in=product_ids)
+            product_categories = product_categories.filter(product_id__in=product_ids)
+
+        variant_fields = [variant_field for variant_field, _ in MEASUREMENT_USER_FIELDS]
+        rows = list(variants.order_by('product_id', 'id').values_list(
+            'id', 'product_id', 'product__shop_id', 'is_available', 'discount_rate', *variant_fields
+        ))
+
+        self.variant_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.product_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        self.shop_ids = np.array([row[2] for row in rows], dtype=np.int64)
+        self.is_available = np.array([row[3] for row in rows], dtype=bool)
+        self.discount_rates = np.array([row[4] for row in rows], dtype=np.int16)
+        # Missing measurements are NaN
+        self.measurements = np.array(
+            [[np.nan if value is None else float(value) for value in row[5:]] for row in rows], dtype=np.float32
+        ).reshape(len(rows), len(variant_fields))
+
+        # Product ids per category and per gender, sorted for np.isin
+        category_product_ids = {}
+        gender_product_ids = {}
+        for product_id, category_id, gender in product_categories.values_list('product_id', 'category_id',
+                                                                              'category__gender'):
+            category_product_ids.setdefault(category_id, set()).add(product_id)
+            gender_product_ids.setdefault(gender, set()).add(product_id)
+        self.category_product_ids = {key: np.array(sorted(value), dtype=np.int64)
+                                     for key, value in category_product_ids.items()}
+        self.gender_product_ids = {key: np.array(sorted(value), dtype=np.int64)
+                                   for key, value in gender_product_ids.items()}
+
+    def __len__(self):
+        return len(self.variant_ids)
+
+    def candidates_mask(self, category_id=None, shop_id=None, gender=None, min_discount_rate=None, product_ids=None):
+        """Available variants matching the filters. product_ids is any iterable of ids, e.g. a values_list queryset."""
+        mask = self.is_available.copy()
+        if product_ids is not None:
+            mask &= np.isin(self.product_ids, np.fromiter(product_ids, dtype=np.int64))
+        if category_id is not None:
+            mask &= np.isin(self.product_ids, self.category_product_ids.get(int(category_id), []))
+        if shop_id is not None:
+            mask &= self.shop_ids == int(shop_id)
+        if gender is not None:
+            mask &= np.isin(self.product_ids, self.gender_product_ids.get(gender, []))
+        if min_discount_rate is not None:
+            mask &= self.discount_rates >= float(min_discount_rate)
+        return mask
+
+    def scores(self, user_additional, indices):
+        columns = []
+        user_values = []
+        for column, (_, user_field) in enumerate(MEASUREMENT_USER_FIELDS):
+            user_value = getattr(user_additional, user_field)
+            if user_value is not None:
+                columns.append(column)
+                user_values.append(float(user_value))
+
+        diffs = np.abs(self.measurements[np.ix_(indices, columns)] - np.array(user_values, dtype=np.float32))
+        scores = np.nansum(diffs, axis=1)
+        # Variants without any comparable measurement are ranked last
+        scores[np.isnan(diffs).all(axis=1)] = np.inf
+        return scores
+
+    def best_fit_variant_ids(self, user_additional, **candidate_filters):
+        """Returns the id of the best fitting available variant of every product that has candidates."""
+        indices = np.flatnonzero(self.candidates_mask(**candidate_filters))
+        if not len(indices):
+            return self.variant_ids[:0]
+
+        scores = self.scores(user_additional, indices)
+        # Sort by product, then score. The first variant of each product group is its best fit.
+        order = np.lexsort((scores, self.product_ids[indices]))
+        sorted_indices = indices[order]
+        _, first_positions = np.unique(self.product_ids[sorted_indices], return_index=True)
+        return self.variant_ids[sorted_indices[first_positions]]
+
+
+def build_size_profiles(profiles_per_gender=150, iterations=20):
+    """
+    Replaces the size profiles with k-means clusters of the measurements of the users, per gender interested.
+    The measurements a gender mostly leaves empty (e.g. bust for men) are left empty on its profiles.
+    """
+    user_fields = [user_field for _, user_field in MEASUREMENT_USER_FIELDS]
+    size_profiles = []
+    for gender in GenderChoices.values:
+        rows = UserAdditional.objects.filter(gender_interested=gender).values_list(*user_fields)
+        points = np.array([[np.nan if value is None else float(value) for value in row] for row in rows],
+                          dtype=np.float64).reshape(-1, len(user_fields))
+        if not len(points):
+            continue
+
+        used_columns = np.isnan(points).mean(axis=0) < 0.5
+        points = points[:, used_columns]
+        # Missing values of the used columns are replaced with the column mean
+        points = np.where(np.isnan(points), np.nanmean(points, axis=0), points)
+
+        unique_points = np.unique(points, axis=0)
+        rng = np.random.default_rng(0)
+        centroids = unique_points[rng.choice(len(unique_points), min(profiles_per_gender, len(unique_points)),
+                                             replace=False)]
+        for _ in range(iterations):
+            # Squared euclidean distances, without materializing the points x centroids x measurements array
+            distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+            labels = np.argmin(distances, axis=1)
+            for cluster in range(len(centroids)):
+                members = points[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+
+        for centroid in centroids:
+            values = iter(centroid)
+            size_profile = SizeProfile(gender_interested=gender)
+            for user_field, is_used in zip(user_fields, used_columns):
+                if not is_used:
+                    continue
+                value = next(values)
+                # Centimeters are whole numbers, shoe sizes go by halves
+                setattr(size_profile, user_field,
+                        round(value * 2) / 2 if user_field == 'shoe_size' else int(round(value)))
+            size_profiles.append(size_profile)
+
+    SizeProfile.objects.all().delete()
+    return SizeProfile.objects.bulk_create(size_profiles)
+
+
+def refresh_best_fit_variants(product_ids=None):
+    """
+    Recomputes the best-fit variant of every size profile for the given products, or for the whole catalog.
+    Returns the number of stored best-fit variants.
+    """
+    size_profiles = list(SizeProfile.objects.all())
+    if not size_profiles:
+        return 0
+
+    best_fit_variants = BestFitVariant.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        best_fit_variants = best_fit_variants.filter(product_id__in=product_ids)
+    best_fit_variants.delete()
+
+    engine = FitScoringEngine(product_ids=product_ids)
+    variant_product_ids = dict(zip(engine.variant_ids.tolist(), engine.product_ids.tolist()))
+    created_count = 0
+    for size_profile in size_profiles:
+        created_count += len(BestFitVariant.objects.bulk_create([
+            BestFitVariant(size_profile=size_profile, product_id=variant_product_ids[variant_id], variant_id=variant_id)
+            for variant_id in engine.best_fit_variant_ids(size_profile).tolist()
+        ], batch_size=5000))
+    return created_count
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_fit_engine():
+    """
+    Returns the engine of this process, reloaded when the global catalog version changed since it was loaded.
+    """
+    global _engine
+
+    catalog_version = CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE)
+    version = None if catalog_version is None else (catalog_version.version, catalog_version.token)
+
+    engine = _engine
+    if engine is None or engine.catalog_version != version:
+        with _engine_lock:
+            if _engine is None or _engine.catalog_version != version:
+                _engine = FitScoringEngine(catalog_version=version)
+            engine = _engine
+    return engine
@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from clothing.fitting import FitScoringEngine
+from clothing.models import Variant
+from clothing.views import get_best_fit_variant, filter_category_gender
+from user.models import UserAdditional
+
+
+class Command(BaseCommand):
+    help = 'Compares the SQL and the NumPy best-fit scoring on the profiles of existing users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Number of user profiles to score')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per user profile and backend')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        profiles = list(UserAdditional.objects.all()[:options['users']])
+        if not profiles:
+            raise CommandError('There are no user profiles (UserAdditional) to score.')
+
+        started_at = time.perf_counter()
+        engine = FitScoringEngine()
+        load_time = time.perf_counter() - started_at
+        self.stdout.write(f'Engine loaded {len(engine)} variants in {load_time * 1000:.1f} ms')
+
+        timings = {'sql': [], 'numpy': [], 'numpy (scoring only)': []}
+        mismatches = 0
+        for user_additional in profiles:
+            feed = filter_category_gender(Variant.objects.all(), user_additional.gender_interested)
+
+            for _ in range(options['repeat']):
+                with override_settings(FIT_SCORING_BACKEND='sql'):
+                    started_at = time.perf_counter()
+                    sql_ids = set(get_best_fit_variant(user_additional, feed).values_list('id', flat=True))
+                    timings['sql'].append(time.perf_counter() - started_at)
+
+                started_at = time.perf_counter()
+                engine_ids = engine.best_fit_variant_ids(user_additional, gender=user_additional.gender_interested)
+                timings['numpy (scoring only)'].append(time.perf_counter() - started_at)
+
+                with override_settings(FIT_SCORING_BACKEND='numpy'):
+                    started_at = time.perf_counter()
+                    numpy_ids = set(get_best_fit_variant(
+                        user_additional, feed, gender=user_additional.gender_interested
+                    ).values_list('id', flat=True))
+                    timings['numpy'].append(time.perf_counter() - started_at)
+
+            # Variants with equal scores may be picked differently
+            mismatches += len(sql_ids ^ numpy_ids)
+
+        for backend, backend_timings in timings.items():
+            self.stdout.write(
+                f'{backend:>22}: median {statistics.median(backend_timings) * 1000:.1f} ms, '
+                f'max {max(backend_timings) * 1000:.1f} ms'
+            )
+        self.stdout.write(f'Engine returned {len(engine_ids)} variants for the last profile, '
+                          f'{mismatches} variants differ between the backends (ties)')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clothing.fitting import build_size_profiles, refresh_best_fit_variants
+
+
+class Command(BaseCommand):
+    help = 'Clusters the user measurements into size profiles and precomputes their best-fit variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles-per-gender', type=int, default=150, help='Number of profiles per gender')
+        parser.add_argument('--refresh-only', action='store_true',
+                            help='Keep the current profiles and only recompute their best-fit variants')
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        with transaction.atomic():
+            if not options['refresh_only']:
+                size_profiles = build_size_profiles(profiles_per_gender=options['profiles_per_gender'])
+                self.stdout.write(f'Built {len(size_profiles)} size profiles')
+
+            best_fit_variants_count = refresh_best_fit_variants()
+
+        self.stdout.write(f'Stored {best_fit_variants_count} best-fit variants '
+                          f'in {time.perf_counter() - started_at:.1f} s')
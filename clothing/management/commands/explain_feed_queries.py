@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.settings import api_settings
+
+from clothing.models import Category, Product, Shop, Variant, SavedVariant, TrackedVariant, Sizing
+from clothing.views import get_best_fit_variant, get_middle_variants, filter_category_gender
+from user.models import UserAdditional
+
+
+# Indexes added for the feed access paths (migration 0026_feed_indexes)
+FEED_INDEXES = (
+    'product_live_middle_var_idx',
+    'product_live_shop_idx',
+    'variant_available_product_idx',
+    'saved_variant_live_user_idx',
+    'tracked_variant_live_user_idx',
+    'product_categories_category_idx',
+)
+
+
+class Command(BaseCommand):
+    help = 'Prints the query plans of the hot feed queries without and with the feed indexes. The indexes are ' \
+           'dropped in a transaction that is rolled back, which locks the tables meanwhile, so run it against a ' \
+           'benchmark database (e.g. a generated large catalog) and not production.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Run the queries (EXPLAIN ANALYZE)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The feed indexes are compared on PostgreSQL only.')
+
+        queries = self.get_queries()
+        if not queries:
+            raise CommandError('The catalog is empty.')
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index_name in FEED_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(index_name)}')
+            self.print_plans('before', queries, options['analyze'])
+            transaction.set_rollback(True)
+
+        self.print_plans('after', queries, options['analyze'])
+
+    def get_queries(self):
+        page_size = api_settings.PAGE_SIZE
+        live_variants = Variant.objects.filter(product__is_deleted=False)
+        queries = {
+            'variants': get_middle_variants(live_variants)[:page_size],
+        }
+
+        category = Category.objects.annotate(products_count=Count('products')).order_by('-products_count').first()
+        if category is not None:
+            category_variants = live_variants.filter(product__categories__id=category.id)
+            queries['category variants'] = get_middle_variants(category_variants)[:page_size]
+            queries['gender variants'] = get_middle_variants(
+                filter_category_gender(live_variants, category.gender)
+            )[:page_size]
+
+            user_additional = UserAdditional.objects.filter(gender_interested=category.gender).first()
+            if user_additional is not None:
+                with override_settings(FIT_SCORING_BACKEND='sql'):
+                    queries['category best fit'] = get_best_fit_variant(user_additional, category_variants)[:page_size]
+
+        shop = Shop.objects.annotate(products_count=Count('products')).order_by('-products_count').first()
+        if shop is not None:
+            queries['shop products'] = Product.objects.filter(shop_id=shop.id)[:page_size]
+
+        variant = Variant.objects.order_by('-id').first()
+        if variant is not None:
+            queries['sizing'] = Sizing.objects.filter(variant_id=variant.id, option=Sizing.SizingOptionChoices.WAIST)
+
+        saved_variant = SavedVariant.objects.order_by('-id').first()
+        if saved_variant is not None:
+            queries['saved variants'] = Variant.objects.filter(
+                savedvariant__user_id=saved_variant.user_id, savedvariant__is_deleted=False
+            )[:page_size]
+
+        tracked_variant = TrackedVariant.objects.order_by('-id').first()
+        if tracked_variant is not None:
+            queries['tracked variants'] = TrackedVariant.objects.filter(
+                user_id=tracked_variant.user_id, is_deleted=False
+            ).values_list('variant_id', flat=True)
+
+        return queries
+
+    def print_plans(self, title, queries, analyze):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'=== {title} the feed indexes ==='))
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_LABEL(name))
+            self.stdout.write(self.explain(queryset, analyze))
+            self.stdout.write('')
+
+    @staticmethod
+    def explain(queryset, analyze):
+        # QuerySet.explain prefixes the subquery of window filters too (e.g. the best fits), which PostgreSQL
+        # rejects, so the compiled query is explained as a whole
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {"ANALYZE " if analyze else ""}{sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from clothing.models import Category, Shop, Product, Variant, Sizing, SavedVariant, CatalogVersion, SHUFFLE_KEY_RANGE
+from clothing.sizes import GARMENT_TYPES, get_size_code
+from scraper import constants
+from user.models import User, UserAdditional, GenderChoices
+
+
+ADJECTIVES = ('Classic', 'Relaxed', 'Slim', 'Organic', 'Everyday', 'Merino', 'Recycled', 'Lightweight', 'Heritage',
+              'Technical', 'Cropped', 'Oversized', 'Stretch', 'Waxed', 'Brushed', 'Linen')
+NOUNS = {
+    'TOP': ('Tee', 'Shirt', 'Sweater', 'Hoodie', 'Cardigan', 'Blazer', 'Jacket', 'Parka', 'Dress', 'Polo'),
+    'BOTTOM': ('Jeans', 'Chinos', 'Trousers', 'Joggers', 'Shorts', 'Skirt', 'Leggings'),
+    'SHOE': ('Sneakers', 'Boots', 'Loafers', 'Sandals', 'Runners'),
+}
+
+# Mean and standard deviation of the generated user measurements, per gender
+USER_MEASUREMENTS = {
+    GenderChoices.MEN: {
+        'weight': (80, 12), 'height': (177, 7), 'shoulder_size': (46, 3), 'chest_size': (100, 8),
+        'waist_size': (86, 9), 'hips_size': (100, 7), 'inseam': (81, 4), 'shoe_size': (10, 1.5),
+    },
+    GenderChoices.WOMEN: {
+        'weight': (65, 11), 'height': (164, 7), 'shoulder_size': (40, 2.5), 'bust_size': (92, 8),
+        'waist_size': (74, 9), 'hips_size': (100, 9), 'inseam': (77, 4), 'shoe_size': (8, 1.3),
+    },
+}
+
+
+def parse_sizing_value(value: str):
+    """Size guide cell -> measurement, where ranges (e.g. '36-37') and alternatives (e.g. '8/9') are averaged."""
+    separator = '-' if '-' in value else '/'
+    try:
+        values = [float(part) for part in value.split(separator)]
+    except ValueError:
+        return None
+    return round(sum(values) / len(values), 1)
+
+
+def load_size_guides():
+    """
+    Returns the size guides of the shop fixtures with the chicpic category of each, as
+    (category, size guide type, [(size, us shoe size, sizings)]) tuples.
+    """
+    categories = {(category.title, category.gender): category for category in Category.objects.all()}
+    genders = {label: value for value, label in GenderChoices.choices}
+    sizing_options = {label.lower(): value for value, label in Sizing.SizingOptionChoices.choices}
+
+    size_guides = []
+    for shop_name in sorted(os.listdir(constants.SHOP_SIZE_GUIDES_DIR)):
+        categories_file_path = constants.SHOP_CATEGORIES_CONVERTER_FILE_PATH.format(shop_name=shop_name)
+        if not os.path.exists(categories_file_path):
+            continue
+        with open(categories_file_path, 'r') as f:
+            shop_categories = json.load(f)
+
+        for file_name in sorted(os.listdir(os.path.join(constants.SHOP_SIZE_GUIDES_DIR, shop_name))):
+            size_guide_type = os.path.splitext(file_name)[0]
+            gender_label, _, garment_label = size_guide_type.partition('-')
+            shop_category = next((shop_category for shop_category in shop_categories
+                                  if shop_category['gender'] == gender_label and shop_category['title'] == garment_label),
+                                 None)
+            if shop_category is None:
+                continue
+            category = categories.get((shop_category['equivalent_chicpic_name'], genders.get(gender_label)))
+            if category is None:
+                continue
+
+            file_path = constants.SHOP_SIZE_GUIDES_FILE_PATH.format(shop_name=shop_name, size_guide_type=size_guide_type)
+            with open(file_path, 'r') as csv_file:
+                sizes = []
+                for row in csv.DictReader(csv_file):
+                    size = row.pop('Size')
+                    sizings = []
+                    for column, value in row.items():
+                        option = sizing_options.get((column or '').lower())
+                        value = parse_sizing_value(value or '')
+                        if option is not None and value is not None:
+                            sizings.append((option, value))
+                    sizes.append((size, row.get('Shoe Size'), sizings))
+            if sizes:
+                size_guides.append((category, size_guide_type, sizes))
+    return size_guides
+
+
+def load_colors():
+    colors = {}
+    for file_name in sorted(os.listdir(constants.COLORS_CONVERTER_DIR)):
+        with open(os.path.join(constants.COLORS_CONVERTER_DIR, file_name), 'r') as f:
+            shop_colors = json.load(f)
+        if isinstance(shop_colors, dict):
+            colors.update((name, color_hex) for name, color_hex in shop_colors.items() if color_hex)
+    return sorted(colors.items())
+
+
+class Command(BaseCommand):
+    help = 'Generates a large synthetic catalog (shops, products, variants with sizings from the shop size guides) ' \
+           'and users with measurements, for load tests and query plans. The categories have to be loaded first.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=50, help='Number of shops')
+        parser.add_argument('--variants', type=int, default=1_000_000, help='Approximate number of variants')
+        parser.add_argument('--users', type=int, default=10_000, help='Number of users with measurements')
+        parser.add_argument('--saved-variants', type=int, default=5, help='Saved variants per user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed generates the same data')
+        parser.add_argument('--batch-size', type=int, default=2_000, help='Products inserted per batch')
+        parser.add_argument('--prefix', default='Synthetic', help='Name prefix of the generated shops and users')
+        parser.add_argument('--clear', action='store_true', help='Delete the data generated with the prefix first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        started_at = time.perf_counter()
+
+        size_guides = load_size_guides()
+        if not size_guides:
+            raise CommandError('No size guide matches a category. Load the categories first (loaddata categories).')
+        colors = load_colors()
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            elif Shop.objects.with_deleted().filter(name__startswith=self.prefix).exists():
+                raise CommandError(f'Shops named "{self.prefix} ..." exist already, use --clear to replace them.')
+
+            shops = self.create_shops(options['shops'])
+            variant_ids = self.create_catalog(shops, size_guides, colors, options['variants'], options['batch_size'])
+            self.create_users(options['users'], options['saved_variants'], variant_ids)
+
+            for shop in shops:
+                CatalogVersion.bump(shop_id=shop.id)
+
+        self.stdout.write(f'Generated the catalog in {time.perf_counter() - started_at:.1f} s. '
+                          f'Run build_size_profiles to precompute the best-fit variants.')
+
+    def clear(self):
+        User.objects.with_deleted().filter(username__startswith=self.prefix.lower()).hard_delete()
+        Shop.objects.with_deleted().filter(name__startswith=self.prefix).hard_delete()
+
+    def create_shops(self, shops_count):
+        shops = Shop.objects.bulk_create([
+            Shop(name=f'{self.prefix} {number:03}', website=f'https://{self.prefix.lower()}-{number}.example.com/')
+            for number in range(1, shops_count + 1)
+        ])
+        self.stdout.write(f'Created {len(shops)} shops')
+        return shops
+
+    def create_catalog(self, shops, size_guides, colors, variants_count, batch_size):
+        rng = self.rng
+        product_original_id = (Product.objects.with_deleted().aggregate(Max('original_id'))['original_id__max'] or 0) + 1
+        variant_original_id = (Variant.objects.aggregate(Max('original_id'))['original_id__max'] or 0) + 1
+        variant_ids = []
+        products_count = 0
+
+        while len(variant_ids) < variants_count:
+            # Products of the batch, with their category, variants and variant sizings
+            batch = []
+            batch_variants_count = 0
+            while len(batch) < batch_size and len(variant_ids) + batch_variants_count < variants_count:
+                shop = shops[products_count % len(shops)]
+                category, size_guide_type, sizes = rng.choice(size_guides)
+                noun = rng.choice(NOUNS[GARMENT_TYPES.get(size_guide_type.partition('-')[2], 'TOP')])
+                product = Product(
+                    original_id=product_original_id,
+                    shop=shop,
+                    brand=shop.name,
+                    title=f'{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {noun}',
+                    description=f'{category.get_gender_display()} {category.title.lower()}, {noun.lower()}.',
+                )
+                product_original_id += 1
+                products_count += 1
+
+                original_price = Decimal(rng.randrange(20, 300)) - Decimal('0.01')
+                discount_rate = rng.choice((0, 0, 0, 10, 20, 30, 50))
+                final_price = (original_price * (100 - discount_rate) / 100).quantize(Decimal('0.01'))
+                variants = []
+                for color_name, color_hex in rng.sample(colors, min(len(colors), rng.randint(1, 3))):
+                    for size, us_shoe_size, size_sizings in sizes:
+                        variant = Variant(
+                            original_id=variant_original_id,
+                            image_src=f'https://cdn.example.com/{product.original_id}/{color_hex}.jpg',
+                            link=f'{shop.website}products/{product.original_id}?variant={variant_original_id}',
+                            original_price=original_price,
+                            final_price=final_price,
+                            discount_rate=Variant.calculate_discount_rate(original_price, final_price),
+                            is_available=rng.random() < 0.85,
+                            color_hex=color_hex[:20],
+                            size=size[:10],
+                            option1=color_name[:40],
+                            option2=size[:40],
+                            shuffle_key=rng.randrange(SHUFFLE_KEY_RANGE),
+                            size_code=get_size_code(size_guide_type, size, us_shoe_size),
+                        )
+                        sizings = [Sizing(option=option, value=value) for option, value in size_sizings]
+                        variant.set_measurements(sizings)
+                        variants.append((variant, sizings))
+                        variant_original_id += 1
+
+                # Summary of the variants, as Product.update_summary computes it
+                product.preview_image = variants[0][0].image_src
+                product.has_discount = final_price < original_price
+                product.min_final_price = product.max_final_price = final_price
+                product.variants_count = len(variants)
+
+                batch.append((product, category, variants))
+                batch_variants_count += len(variants)
+
+            variant_ids += self.insert_batch(batch)
+            self.stdout.write(f'{products_count} products, {len(variant_ids)} variants')
+
+        if connection.vendor == 'postgresql':
+            for shop in shops:
+                Product.objects.filter(shop=shop).update(search_document=Product.search_document_vector(shop.name))
+        return variant_ids
+
+    def insert_batch(self, batch):
+        products = Product.objects.bulk_create([product for product, _, _ in batch])
+        Product.categories.through.objects.bulk_create([
+            Product.categories.through(product_id=product.id, category_id=category.id)
+            for product, category, _ in batch
+        ])
+
+        variants = []
+        for product, _, product_variants in batch:
+            for variant, _ in product_variants:
+                variant.product = product
+                variants.append(variant)
+        Variant.objects.bulk_create(variants, batch_size=5_000)
+
+        sizings = []
+        for product, _, product_variants in batch:
+            for variant, variant_sizings in product_variants:
+                for sizing in variant_sizings:
+                    sizing.variant = variant
+                    sizings.append(sizing)
+        Sizing.objects.bulk_create(sizings, batch_size=10_000)
+
+        # Middle variant, as Product.update_middle_variant selects it
+        for product, _, product_variants in batch:
+            available_variant_ids = sorted(variant.id for variant, _ in product_variants if variant.is_available)
+            product.middle_variant_id = available_variant_ids[(len(available_variant_ids) - 1) // 2] \
+                if available_variant_ids else None
+        Product.objects.bulk_update(products, ['middle_variant'], batch_size=5_000)
+
+        return [variant.id for variant in variants]
+
+    def create_users(self, users_count, saved_variants_count, variant_ids):
+        rng = self.rng
+        # Hashing is slow, all the generated users share the password
+        password = make_password(self.prefix.lower())
+        username_prefix = self.prefix.lower()
+        users = User.objects.bulk_create([
+            User(email=f'{username_prefix}{number}@example.com', username=f'{username_prefix}{number}',
+                 password=password, is_verified=True)
+            for number in range(1, users_count + 1)
+        ], batch_size=5_000)
+
+        user_additionals = []
+        for user in users:
+            gender = rng.choice(GenderChoices.values)
+            measurements = {
+                field_name: rng.gauss(mean, deviation)
+                for field_name, (mean, deviation) in USER_MEASUREMENTS[gender].items()
+            }
+            measurements = {
+                field_name: Decimal(round(value * 2) / 2) if field_name == 'shoe_size' else int(round(value))
+                for field_name, value in measurements.items()
+            }
+            user_additionals.append(UserAdditional(user=user, gender_interested=gender, **measurements))
+        UserAdditional.objects.bulk_create(user_additionals, batch_size=5_000)
+
+        SavedVariant.objects.bulk_create([
+            SavedVariant(user=user, variant_id=variant_id)
+            for user in users
+            for variant_id in rng.sample(variant_ids, min(saved_variants_count, len(variant_ids)))
+        ], batch_size=5_000)
+        self.stdout.write(f'Created {len(users)} users')
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_sizing_values(apps, schema_editor):
+    Variant = apps.get_model('clothing', 'Variant')
+    Sizing = apps.get_model('clothing', 'Sizing')
+
+    measurement_fields = {
+        'Shoulder': 'shoulder',
+        'Bust': 'bust',
+        'Chest': 'chest',
+        'Waist': 'waist',
+        'Hips': 'hips',
+        'Inseam': 'inseam',
+        'Shoe Size': 'shoe_size',
+    }
+
+    for option, field_name in measurement_fields.items():
+        value = Sizing.objects.filter(variant=OuterRef('pk'), option=option).values('value')[:1]
+        Variant.objects.filter(sizings__option=option).update(**{field_name: Subquery(value)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0016_product_deleted_at_alter_product_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='bust',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='chest',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='hips',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='inseam',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='shoe_size',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='shoulder',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='waist',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True),
+        ),
+        migrations.RunPython(copy_sizing_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_middle_variants(apps, schema_editor):
+    Product = apps.get_model('clothing', 'Product')
+    Variant = apps.get_model('clothing', 'Variant')
+
+    for product in Product.objects.all():
+        available_variant_ids = list(
+            Variant.objects.filter(product=product, is_available=True).order_by('id').values_list('id', flat=True)
+        )
+        if available_variant_ids:
+            product.middle_variant_id = available_variant_ids[(len(available_variant_ids) - 1) // 2]
+            product.save(update_fields=['middle_variant'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0017_variant_measurements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='middle_variant',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clothing.variant'),
+        ),
+        migrations.RunPython(set_middle_variants, migrations.RunPython.noop),
+    ]
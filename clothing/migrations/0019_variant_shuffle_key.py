@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:49
+
+import random
+
+import clothing.models
+from django.db import migrations, models
+
+
+def randomize_shuffle_keys(apps, schema_editor):
+    Variant = apps.get_model('clothing', 'Variant')
+
+    # AddField gives every existing row the same default value
+    variants = []
+    for variant in Variant.objects.only('id').iterator():
+        variant.shuffle_key = random.randrange(2 ** 31 - 1)
+        variants.append(variant)
+    Variant.objects.bulk_update(variants, ['shuffle_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0018_product_middle_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='shuffle_key',
+            field=models.IntegerField(default=clothing.models.random_shuffle_key, editable=False),
+        ),
+        migrations.RunPython(randomize_shuffle_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['shuffle_key', 'id'], name='variant_shuffle_key_idx'),
+        ),
+    ]
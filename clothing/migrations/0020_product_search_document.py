@@ -0,0 +1,50 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+def fill_search_documents(apps, schema_editor):
+    Shop = apps.get_model('clothing', 'Shop')
+    Product = apps.get_model('clothing', 'Product')
+
+    for shop in Shop.objects.all():
+        Product.objects.filter(shop=shop).update(search_document=(
+            SearchVector('title', weight='A', config='english') +
+            SearchVector(Value(shop.name), weight='A', config='english') +
+            SearchVector('brand', weight='B', config='english') +
+            SearchVector('description', weight='C', config='english')
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0019_variant_shuffle_key'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='product_search_document_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='product_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['brand'], name='product_brand_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
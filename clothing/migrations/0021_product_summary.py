@@ -0,0 +1,62 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:52
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q
+
+
+def summarize_products(apps, schema_editor):
+    Product = apps.get_model('clothing', 'Product')
+    Variant = apps.get_model('clothing', 'Variant')
+
+    for product in Product.objects.all():
+        variants = Variant.objects.filter(product=product)
+        summary = variants.aggregate(
+            min_final_price=Min('final_price'),
+            max_final_price=Max('final_price'),
+            variants_count=Count('id'),
+            discounted_variants_count=Count('id', filter=Q(final_price__lt=F('original_price'))),
+        )
+
+        product.preview_image = variants.order_by('-id').values_list('image_src', flat=True).first() or ''
+        product.has_discount = summary['discounted_variants_count'] > 0
+        product.min_final_price = summary['min_final_price']
+        product.max_final_price = summary['max_final_price']
+        product.variants_count = summary['variants_count']
+        product.save(update_fields=['preview_image', 'has_discount', 'min_final_price', 'max_final_price',
+                                    'variants_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0020_product_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='has_discount',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_final_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_final_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='preview_image',
+            field=models.URLField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='variants_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(summarize_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-16 22:58
+
+from django.db import migrations, models
+from django.db.models import Case, When, F, IntegerField
+from django.db.models.functions import Floor
+
+
+def fill_discount_rates(apps, schema_editor):
+    Variant = apps.get_model('clothing', 'Variant')
+
+    Variant.objects.update(discount_rate=Case(
+        When(
+            original_price__gt=F('final_price'),
+            then=Floor((F('original_price') - F('final_price')) * 100 / F('original_price')),
+        ),
+        default=0,
+        output_field=IntegerField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0022_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='discount_rate',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_discount_rates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['is_available', 'discount_rate'], name='variant_discount_rate_idx'),
+        ),
+    ]
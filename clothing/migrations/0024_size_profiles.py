@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0023_variant_discount_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SizeProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gender_interested', models.CharField(choices=[('W', 'Women'), ('M', 'Men')], max_length=10)),
+                ('shoulder_size', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('bust_size', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('chest_size', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('waist_size', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('hips_size', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('inseam', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('shoe_size', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BestFitVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clothing.product')),
+                ('size_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_fit_variants', to='clothing.sizeprofile')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_fits', to='clothing.variant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['size_profile', 'variant'], name='best_fit_profile_variant_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bestfitvariant',
+            constraint=models.UniqueConstraint(fields=('size_profile', 'product'), name='unique_size_profile_product'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0024_size_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variant',
+            name='size_code',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['size_code', 'is_available'], name='variant_size_code_idx'),
+        ),
+    ]
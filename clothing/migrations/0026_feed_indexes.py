@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0025_variant_size_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['middle_variant'], name='product_live_middle_var_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['shop', '-id'], name='product_live_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedvariant',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'variant'], name='saved_variant_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trackedvariant',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'variant'], name='tracked_variant_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['product', 'id'], name='variant_available_product_idx'),
+        ),
+        # The auto-created through table only has the (product, category) unique index and single column indexes.
+        # Category feeds go from the category to its products.
+        migrations.RunSQL(
+            'CREATE INDEX product_categories_category_idx ON clothing_product_categories (category_id, product_id)',
+            reverse_sql='DROP INDEX product_categories_category_idx',
+        ),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 4.2.16 on 2026-10-17 00:40
+
+import re
+
+from django.db import migrations
+
+# Frozen copy of the size code rules of clothing.sizes at the time of this migration, so later changes to them do
+# not change what the migration does.
+GENDER_LABELS = {'W': 'Women', 'M': 'Men'}
+GARMENT_TYPES = {
+    'Tops': 'TOP',
+    'Blazers': 'TOP',
+    'Outerwear': 'TOP',
+    'Dresses': 'TOP',
+    'Bottoms': 'BOTTOM',
+    'Footwear': 'SHOE',
+    'Shoes': 'SHOE',
+}
+CATEGORY_SIZE_GUIDE_GARMENTS = {
+    'Tops & Shirts': 'Tops',
+    'Shirts': 'Tops',
+    'T-Shirts': 'Tops',
+    'Sweaters & Cardigans': 'Tops',
+    'Sweaters': 'Tops',
+    'Outerwear': 'Outerwear',
+    'Dresses': 'Dresses',
+    'Bottoms': 'Bottoms',
+    'Shorts': 'Bottoms',
+    'Shoes': 'Shoes',
+}
+LETTER_SIZE_ALIASES = {
+    '2XS': 'XXS',
+    '2XL': 'XXL',
+    'XXXL': '3XL',
+    'X': '1X',
+}
+FRENCH_SIZE_SUFFIXES = ('TP', 'TG', 'P', 'M', 'G')
+
+LETTER_SIZE_PATTERN = re.compile(r'^(?P<size>\d?X*[SML]|\d?X)(?P<suffix>TP|TG|P|M|G|T)?$')
+WAIST_INSEAM_PATTERN = re.compile(r'^(?P<waist>\d{2})[X/](?P<inseam>\d{2})$')
+NUMERIC_SIZE_PATTERN = re.compile(r'^(?P<size>\d+(\.\d+)?)(R|T)?$')
+
+
+def _format_number(value):
+    return f'{value:g}'
+
+
+def normalize_letter_size(size):
+    if '/' in size:
+        size = size.split('/')[0]
+
+    match = LETTER_SIZE_PATTERN.match(size)
+    if match is None:
+        return None
+
+    letter_size = match['size']
+    if match['suffix'] in FRENCH_SIZE_SUFFIXES and letter_size.endswith('X'):
+        letter_size += 'L'
+    return LETTER_SIZE_ALIASES.get(letter_size, letter_size)
+
+
+def normalize_numeric_size(size, gender, garment_type):
+    waist_inseam = WAIST_INSEAM_PATTERN.match(size)
+    if waist_inseam is not None:
+        return f"W{waist_inseam['waist']}"
+
+    match = NUMERIC_SIZE_PATTERN.match(size)
+    if match is None:
+        return None
+
+    value = float(match['size'])
+    if garment_type == 'SHOE':
+        return f'{"EU" if value >= 30 else "US"}{_format_number(value)}'
+    if gender == 'M':
+        return f'{"W" if garment_type == "BOTTOM" else "C"}{_format_number(value)}'
+    if garment_type == 'BOTTOM' and value > 20:
+        return f'W{_format_number(value)}'
+    return f'US{match["size"] if match["size"] == "00" else _format_number(value)}'
+
+
+def get_category_size_guide(gender, category_title):
+    """Returns the gender and the garment type of the size guide of a category, or None."""
+    garment_label = CATEGORY_SIZE_GUIDE_GARMENTS.get(category_title)
+    if garment_label is None or gender not in GENDER_LABELS:
+        return None
+    return gender, GARMENT_TYPES[garment_label]
+
+
+def get_size_code(size_guide, size):
+    gender, garment_type = size_guide
+    size = size.strip().upper().replace(' ', '')
+    normalized_size = normalize_letter_size(size)
+    if normalized_size is None:
+        normalized_size = normalize_numeric_size(size, gender, garment_type)
+    if normalized_size is None:
+        return None
+    return f'{gender}-{garment_type}:{normalized_size}'
+
+
+def backfill_size_codes(apps, schema_editor):
+    Product = apps.get_model('clothing', 'Product')
+    Variant = apps.get_model('clothing', 'Variant')
+
+    # The size guide of the shop is only known to the integrator, so it is derived from the product categories.
+    # Incremental integrations skip the unchanged products, and would never set their size codes.
+    variants = []
+    products = Product.objects.filter(variants__size_code__isnull=True).distinct().prefetch_related('categories')
+    for product in products.iterator(chunk_size=500):
+        size_guide = next(filter(None, (
+            get_category_size_guide(category.gender, category.title)
+            for category in sorted(product.categories.all(), key=lambda category: category.id)
+        )), None)
+        if size_guide is None:
+            continue
+
+        for variant in Variant.objects.filter(product=product, size_code__isnull=True, size__isnull=False).only('size'):
+            variant.size_code = get_size_code(size_guide, variant.size)
+            if variant.size_code is not None:
+                variants.append(variant)
+    Variant.objects.bulk_update(variants, ['size_code'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothing', '0027_catalogversion_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_size_codes, migrations.RunPython.noop),
+    ]
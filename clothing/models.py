@@ -1,5 +1,12 @@
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
-from django.db.models import F
+from django.db.models import F, Q, Value, Count, Min, Max
+from django.utils import timezone
 
 from core.models import SoftDeleteModel
 from user.models import User, GenderChoices
@@ -61,28 +68,76 @@ class Product(SoftDeleteModel):
     description = models.TextField(blank=True)
     categories = models.ManyToManyField(Category, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Representative available variant of the product, maintained by the integrator
+    middle_variant = models.ForeignKey('Variant', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                       related_name='+')
+    # Summary of the product variants, maintained by the integrator (see update_summary)
+    preview_image = models.URLField(max_length=300, blank=True, editable=False)
+    has_discount = models.BooleanField(default=False, editable=False)
+    min_final_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False)
+    max_final_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False)
+    variants_count = models.PositiveIntegerField(default=0, editable=False)
+    # Full-text search document of the product, maintained by the integrator (see search_document_vector)
+    search_document = SearchVectorField(null=True, editable=False)
+
+    # Text search configuration of search_document
+    SEARCH_CONFIG = 'english'
 
     @property
     def variants(self):
         return Variant.objects.filter(product=self)
 
-    @property
-    def preview_image(self):
-        return Variant.objects.filter(product=self).first().image_src
-
     @property
     def attributes(self):
-        return ProductAttribute.objects.filter(product=self)
-
-    @property
-    def has_discount(self):
-        return Variant.objects.filter(product=self, final_price__lt=F('original_price')).exists()
+        return self.product_attributes.select_related('attribute')
+
+    def update_summary(self):
+        variants = Variant.objects.filter(product=self)
+        summary = variants.aggregate(
+            min_final_price=Min('final_price'),
+            max_final_price=Max('final_price'),
+            variants_count=Count('id'),
+            discounted_variants_count=Count('id', filter=Q(final_price__lt=F('original_price'))),
+        )
+
+        self.preview_image = variants.values_list('image_src', flat=True).first() or ''
+        self.has_discount = summary['discounted_variants_count'] > 0
+        self.min_final_price = summary['min_final_price']
+        self.max_final_price = summary['max_final_price']
+        self.variants_count = summary['variants_count']
+
+    def update_middle_variant(self):
+        available_variant_ids = list(
+            Variant.objects.filter(product=self, is_available=True).order_by('id').values_list('id', flat=True)
+        )
+        if available_variant_ids:
+            self.middle_variant_id = available_variant_ids[(len(available_variant_ids) - 1) // 2]
+        else:
+            self.middle_variant_id = None
+
+    @classmethod
+    def search_document_vector(cls, shop_name: str):
+        return (
+            SearchVector('title', weight='A', config=cls.SEARCH_CONFIG) +
+            SearchVector(Value(shop_name), weight='A', config=cls.SEARCH_CONFIG) +
+            SearchVector('brand', weight='B', config=cls.SEARCH_CONFIG) +
+            SearchVector('description', weight='C', config=cls.SEARCH_CONFIG)
+        )
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ('-id',)
+        indexes = [
+            GinIndex(fields=['search_document'], name='product_search_document_idx'),
+            GinIndex(fields=['title'], name='product_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['brand'], name='product_brand_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Feed joins of the live products, by middle variant and by shop
+            models.Index(fields=['middle_variant'], name='product_live_middle_var_idx',
+                         condition=Q(is_deleted=False)),
+            models.Index(fields=['shop', '-id'], name='product_live_shop_idx', condition=Q(is_deleted=False)),
+        ]
 
 
 class ProductAttribute(models.Model):
@@ -115,6 +170,14 @@ def variant_image_upload_path(variant_obj, uploaded_file_name):
     return f'products/shop_{variant_obj.product.shop.id}/product_{variant_obj.product.id}/{file_name_and_format}'
 
 
+# Upper bound (exclusive) of Variant.shuffle_key
+SHUFFLE_KEY_RANGE = 2 ** 31 - 1
+
+
+def random_shuffle_key():
+    return random.randrange(SHUFFLE_KEY_RANGE)
+
+
 class Variant(models.Model):
     original_id = models.BigIntegerField(unique=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
@@ -128,17 +191,74 @@ class Variant(models.Model):
     size = models.CharField(max_length=10, null=True, blank=True)
     option1 = models.CharField(max_length=40, null=True, blank=True)
     option2 = models.CharField(max_length=40, null=True, blank=True)
+    # Measurements copied from the variant sizings, so best-fit queries don't need to join Sizing
+    shoulder = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    bust = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    chest = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    waist = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    hips = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    inseam = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    shoe_size = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True)
+    # Random but fixed position of the variant, used for the seeded shuffle of the explore feed
+    shuffle_key = models.IntegerField(default=random_shuffle_key, editable=False)
+    # Whole percent off the original price, stored so discount filters can use an index
+    discount_rate = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Canonical size code, comparable across shops (see sizes.get_size_code)
+    size_code = models.CharField(max_length=20, null=True, blank=True, editable=False)
+
+    # Sizing option -> measurement field
+    MEASUREMENT_FIELDS = {
+        'Shoulder': 'shoulder',
+        'Bust': 'bust',
+        'Chest': 'chest',
+        'Waist': 'waist',
+        'Hips': 'hips',
+        'Inseam': 'inseam',
+        'Shoe Size': 'shoe_size',
+    }
 
     class Meta:
         ordering = ('-id',)
+        indexes = [
+            models.Index(fields=['shuffle_key', 'id'], name='variant_shuffle_key_idx'),
+            models.Index(fields=['is_available', 'discount_rate'], name='variant_discount_rate_idx'),
+            models.Index(fields=['size_code', 'is_available'], name='variant_size_code_idx'),
+            # Available variants of a product, for the best-fit ranking and the feeds ordered by id
+            models.Index(fields=['product', 'id'], name='variant_available_product_idx',
+                         condition=Q(is_available=True)),
+        ]
 
     @property
     def has_discount(self):
+        # Also true for discounts under 1%, which have a discount_rate of 0
         return self.final_price < self.original_price
 
-    @property
-    def discount_rate(self):
-        return int((self.original_price - self.final_price) / self.original_price * 100)
+    def save(self, *args, **kwargs):
+        # The stored rate follows the prices, e.g. after an admin edit
+        self.discount_rate = self.calculate_discount_rate(self.original_price, self.final_price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'original_price', 'final_price'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'discount_rate'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def calculate_discount_rate(original_price, final_price) -> int:
+        if original_price is None or final_price is None:
+            return 0
+        original_price = Decimal(str(original_price))
+        final_price = Decimal(str(final_price))
+        if original_price <= final_price:
+            return 0
+        return int((original_price - final_price) / original_price * 100)
+
+    def set_measurements(self, sizings):
+        for field_name in self.MEASUREMENT_FIELDS.values():
+            setattr(self, field_name, None)
+
+        for sizing in sizings:
+            field_name = self.MEASUREMENT_FIELDS.get(sizing.option)
+            if field_name is not None:
+                setattr(self, field_name, sizing.value)
 
     def __str__(self):
         return str(self.id)
@@ -175,6 +295,9 @@ class SavedVariant(models.Model):
 
     class Meta:
         unique_together = ('user', 'variant')
+        indexes = [
+            models.Index(fields=['user', 'variant'], name='saved_variant_live_user_idx', condition=Q(is_deleted=False)),
+        ]
 
 
 # TODO: refactor this model
@@ -186,6 +309,101 @@ class TrackedVariant(models.Model):
 
     class Meta:
         unique_together = ('user', 'variant')
+        indexes = [
+            models.Index(fields=['user', 'variant'], name='tracked_variant_live_user_idx',
+                         condition=Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f'({self.id}) user: {self.user.username} variant: {self.variant.id}'
+
+
+class CatalogVersion(models.Model):
+    """
+    Version of the catalog data, bumped by the integrator and when categories, shops or products are saved, deleted,
+    soft-deleted or restored.
+    Used to invalidate cached catalog responses and as the validator of conditional requests.
+    The token changes with the version. Unlike the version, it does not repeat when the table is reset, so cache keys
+    use both.
+    """
+    GLOBAL_SCOPE = 'global'
+
+    scope = models.CharField(max_length=30, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    token = models.UUIDField(default=uuid.uuid4, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def shop_scope(shop_id):
+        return f'shop:{shop_id}'
+
+    @classmethod
+    def get_version(cls, scope: str):
+        return cls.objects.filter(scope=scope).first()
+
+    @classmethod
+    def bump(cls, shop_id=None):
+        scopes = [cls.GLOBAL_SCOPE]
+        if shop_id is not None:
+            scopes.append(cls.shop_scope(shop_id))
+
+        # One update for the existing scopes, since the catalog signals bump on every product save
+        bumped_count = cls.objects.filter(scope__in=scopes).update(version=F('version') + 1, token=uuid.uuid4(),
+                                                                   updated_at=timezone.now())
+        if bumped_count < len(scopes):
+            for scope in scopes:
+                cls.objects.get_or_create(scope=scope)
+
+    def __str__(self):
+        return f'{self.scope}: {self.version}'
+
+
+class SizeProfile(models.Model):
+    """
+    Representative body measurements of a group of users (see fitting.build_size_profiles). Field names match
+    UserAdditional, so a profile can be scored like a user.
+    """
+    MEASUREMENT_FIELDS = ('shoulder_size', 'bust_size', 'chest_size', 'waist_size', 'hips_size', 'inseam',
+                          'shoe_size')
+
+    gender_interested = models.CharField(max_length=10, choices=GenderChoices.choices)
+    shoulder_size = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    bust_size = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    chest_size = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    waist_size = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    hips_size = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    inseam = models.PositiveSmallIntegerField(null=True, blank=True)  # cm
+    shoe_size = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+
+    def distance(self, user_additional):
+        distance = 0
+        for field_name in self.MEASUREMENT_FIELDS:
+            profile_value = getattr(self, field_name)
+            user_value = getattr(user_additional, field_name)
+            if profile_value is not None and user_value is not None:
+                distance += abs(float(profile_value) - float(user_value))
+        return distance
+
+    @classmethod
+    def get_nearest(cls, user_additional):
+        """Returns the closest profile of the gender the user is interested in, or None if there isn't any."""
+        size_profiles = cls.objects.filter(gender_interested=user_additional.gender_interested)
+        return min(size_profiles, key=lambda size_profile: size_profile.distance(user_additional), default=None)
+
+    def __str__(self):
+        return f'{self.id}: {self.get_gender_interested_display()}'
+
+
+class BestFitVariant(models.Model):
+    """Best fitting available variant of a product for a size profile."""
+    size_profile = models.ForeignKey(SizeProfile, on_delete=models.CASCADE, related_name='best_fit_variants')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='best_fits')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['size_profile', 'product'], name='unique_size_profile_product'),
+        ]
+        indexes = [
+            models.Index(fields=['size_profile', 'variant'], name='best_fit_profile_variant_idx'),
+        ]
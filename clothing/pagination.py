@@ -0,0 +1,227 @@
+import hashlib
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .models import SHUFFLE_KEY_RANGE
+
+
+def without_window_filters(queryset):
+    # Window functions are evaluated after the WHERE clause, so the cursor condition has to be applied
+    # outside of the ranked queryset. Otherwise, every page would rank a different set of variants.
+    if any(getattr(annotation, 'contains_over_clause', False) for annotation in queryset.query.annotations.values()):
+        return queryset.model.objects.filter(pk__in=queryset.values('pk'))
+    return queryset
+
+
+class VariantCursorPagination(CursorPagination):
+    ordering = '-id'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Base of the keyset paginations with an opaque cursor, which encodes the position of the last variant of a page.
+    Subclasses order the queryset and filter it past the position, and pass it to get_page.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    position_types = (int, int)
+
+    def __init__(self):
+        self.base_url = None
+        self.next_position = None
+
+    def get_page(self, queryset, get_position):
+        items = list(queryset[:self.page_size + 1])
+        page = items[:self.page_size]
+        if len(items) > self.page_size:
+            self.next_position = get_position(page[-1])
+        else:
+            self.next_position = None
+
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            values = b64decode(encoded.encode('ascii'), validate=True).decode('ascii').split(':')
+            if len(values) != len(self.position_types):
+                raise ValueError
+            return tuple(position_type(value) for position_type, value in zip(self.position_types, values))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, position):
+        encoded = b64encode(':'.join(map(str, position)).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+
+class SeededShufflePagination(KeysetPagination):
+    """
+    Keyset pagination over a pseudo-random order of the variants, which is stable for a given seed.
+
+    The seed picks a start key, derived from a hash of the seed. Variants are served in (shuffle_key, id) order
+    from the start key to the end of the key range, and then from the beginning of the key range up to the start
+    key, so every seed starts at its own point of the order and no variant appears on two pages. Both laps are
+    served by variant_shuffle_key_idx, and a page reads about page size index entries however large the catalog is.
+    The cursor holds the lap (0 or 1), the shuffle key and the id of the last variant of a page.
+
+    Every seed walks the same cyclic order of the shuffle keys, so two seeds serve the same sequence, rotated. A
+    permutation per seed would have to be computed per row and sorted on every page, which no index can serve. The
+    shuffle keys themselves are random, so the shared order is not related to the ids or the shops.
+    """
+    seed_query_param = 'seed'
+    position_types = (int, int, int)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        start_key = self.get_start_key(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by('shuffle_key', 'id')
+        laps = [
+            queryset.filter(shuffle_key__gte=start_key),
+            queryset.filter(shuffle_key__lt=start_key),
+        ]
+
+        first_lap = 0
+        if position is not None:
+            first_lap, key, pk = position
+            if first_lap not in (0, 1):
+                raise NotFound('Invalid cursor')
+            laps[first_lap] = laps[first_lap].filter(Q(shuffle_key__gt=key) | Q(shuffle_key=key, id__gt=pk))
+
+        # The second lap is only read by the page where the first one ends
+        items = []
+        for lap in range(first_lap, len(laps)):
+            items += [(lap, variant) for variant in laps[lap][:self.page_size + 1 - len(items)]]
+            if len(items) > self.page_size:
+                break
+
+        page = self.get_page(items, lambda item: (item[0], item[1].shuffle_key, item[1].id))
+        return [variant for lap, variant in page]
+
+    def get_start_key(self, request):
+        """The shuffle key the order of the seed starts at."""
+        try:
+            seed = int(request.query_params[self.seed_query_param])
+        except (KeyError, ValueError):
+            raise ValidationError({self.seed_query_param: 'A valid integer is required.'})
+        digest = hashlib.sha256(str(seed).encode('ascii')).digest()
+        return int.from_bytes(digest[:8], 'big') % SHUFFLE_KEY_RANGE
+
+
+class SearchRankCursorPagination(KeysetPagination):
+    """
+    Keyset pagination over the search results in (-rank, -id) order, the order of VariantSearchView. The cursor holds
+    the rank and the id of the last variant of a page.
+    """
+    position_types = (float, int)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request)
+
+        # The best fits are ranked by a window, and the cursor condition has to be applied outside of it. The rank
+        # annotation does not survive the subquery, so the view computes it again.
+        unranked_queryset = without_window_filters(queryset)
+        if unranked_queryset is not queryset:
+            queryset = unranked_queryset.annotate(rank=view.get_search_rank())
+        queryset = queryset.order_by('-rank', '-id')
+
+        if position is not None:
+            rank, pk = position
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=pk))
+
+        return self.get_page(queryset, lambda variant: (variant.rank, variant.id))
+
+
+class VariantFeedPagination(BasePagination):
+    """
+    Page number pagination, with an opt-in keyset mode (?pagination=cursor) on the variant id.
+    The keyset mode skips the count query and serves deep pages as cheap as the first one.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.paginator = PageNumberPagination()
+
+    def get_paginator(self, request):
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            return VariantCursorPagination()
+        return PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        if not isinstance(self.paginator, PageNumberPagination):
+            queryset = without_window_filters(queryset)
+
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
+
+
+class VariantSearchPagination(VariantFeedPagination):
+    """Page number pagination, with an opt-in keyset mode (?pagination=cursor) on the rank and the variant id."""
+
+    def get_paginator(self, request):
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            return SearchRankCursorPagination()
+        return PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # The keyset mode keeps the rank of the window filtered best fits itself (see SearchRankCursorPagination)
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+
+class ExploreVariantsPagination(VariantFeedPagination):
+    """
+    Switches to the seeded shuffle when the client passes a seed (?seed=<int>). The keyset mode of the explore feed
+    is the seeded shuffle, so ?pagination=cursor without a seed is rejected instead of paging in id order.
+    """
+
+    def get_paginator(self, request):
+        if SeededShufflePagination.seed_query_param in request.query_params:
+            return SeededShufflePagination()
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            raise ValidationError({SeededShufflePagination.seed_query_param: 'A seed is required to page the explore '
+                                                                              'feed with cursors.'})
+        return super().get_paginator(request)
@@ -22,6 +22,13 @@ class AttributeSerializer(serializers.ModelSerializer):
 
 
 class ProductAttributeSerializer(serializers.ModelSerializer):
+    values = serializers.SerializerMethodField(read_only=True)
+
+    def get_values(self, obj):
+        # Read the values from the product variants (prefetched in the product detail) instead of a query per attribute
+        field_name = f'option{obj.position}'
+        return list(dict.fromkeys(getattr(variant, field_name) for variant in obj.product.variants.all()))
+
     class Meta:
         model = ProductAttribute
         fields = ('id', 'position', 'name', 'values')
@@ -52,20 +59,28 @@ class VariantDetailSerializer(serializers.ModelSerializer):
     is_tracked = serializers.SerializerMethodField(read_only=True)
 
     def get_is_saved(self, obj):
+        saved_variant_ids = self.context.get('saved_variant_ids')
+        if saved_variant_ids is not None:
+            return obj.id in saved_variant_ids
+
         request_user = self.context['request'].user
         if request_user:
-            return SavedVariant.objects.filter(user=request_user, variant_id=obj.id).exists()
+            return SavedVariant.objects.filter(user=request_user, variant_id=obj.id, is_deleted=False).exists()
         return False
 
     def get_is_tracked(self, obj):
+        tracked_variant_ids = self.context.get('tracked_variant_ids')
+        if tracked_variant_ids is not None:
+            return obj.id in tracked_variant_ids
+
         request_user = self.context['request'].user
         if request_user:
-            return TrackedVariant.objects.filter(user=request_user, variant_id=obj.id).exists()
+            return TrackedVariant.objects.filter(user=request_user, variant_id=obj.id, is_deleted=False).exists()
         return False
 
     class Meta:
         model = Variant
-        fields = '__all__'
+        exclude = ('shuffle_key',)
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
@@ -76,7 +91,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_document',)
 
 
 class SavedVariantSerializer(serializers.ModelSerializer):
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.signals import post_soft_delete, post_restore
+from .models import Category, Shop, Product, ProductAttribute, Variant, Sizing, CatalogVersion
+
+_bumps_suspended = ContextVar('catalog_version_bumps_suspended', default=False)
+
+
+@contextmanager
+def suspend_catalog_version_bumps():
+    """
+    Turns the receivers below off, for writers that bump the catalog version once when they are done (e.g. the
+    integrator). Otherwise every product save updates, and locks, the catalog version rows.
+    """
+    token = _bumps_suspended.set(True)
+    try:
+        yield
+    finally:
+        _bumps_suspended.reset(token)
+
+
+@receiver([post_soft_delete, post_restore], sender=Shop)
+def bump_shop_catalog_version(sender, pks, **kwargs):
+    if _bumps_suspended.get():
+        return
+    for shop_id in pks:
+        CatalogVersion.bump(shop_id=shop_id)
+
+
+@receiver([post_soft_delete, post_restore], sender=Product)
+def bump_product_catalog_version(sender, pks, **kwargs):
+    if _bumps_suspended.get():
+        return
+    shop_ids = Product.objects.with_deleted().filter(pk__in=pks).order_by().values_list('shop_id', flat=True).distinct()
+    for shop_id in shop_ids:
+        CatalogVersion.bump(shop_id=shop_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def bump_category_catalog_version(sender, raw=False, **kwargs):
+    # Fixtures are loaded raw, before the catalog is served
+    if not raw and not _bumps_suspended.get():
+        CatalogVersion.bump()
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def bump_saved_shop_catalog_version(sender, instance, raw=False, **kwargs):
+    if not raw and not _bumps_suspended.get():
+        CatalogVersion.bump(shop_id=instance.id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def bump_saved_product_catalog_version(sender, instance, raw=False, **kwargs):
+    if not raw and not _bumps_suspended.get():
+        CatalogVersion.bump(shop_id=instance.shop_id)
+
+
+@receiver([post_save, post_delete], sender=Variant)
+@receiver([post_save, post_delete], sender=ProductAttribute)
+def bump_saved_product_part_catalog_version(sender, instance, raw=False, **kwargs):
+    # e.g. admin edits of the prices or the availability of a variant
+    if not raw and not _bumps_suspended.get():
+        shop_id = Product.objects.with_deleted().filter(id=instance.product_id).values_list('shop_id', flat=True).first()
+        CatalogVersion.bump(shop_id=shop_id)
+
+
+@receiver([post_save, post_delete], sender=Sizing)
+def bump_saved_sizing_catalog_version(sender, instance, raw=False, **kwargs):
+    if not raw and not _bumps_suspended.get():
+        shop_id = Variant.objects.filter(id=instance.variant_id).values_list('product__shop_id', flat=True).first()
+        CatalogVersion.bump(shop_id=shop_id)
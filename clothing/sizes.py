@@ -0,0 +1,134 @@
+"""
+Canonical size codes, comparable across shops: '<gender>-<garment type>:<size>', e.g. 'W-TOP:M', 'M-BOTTOM:W32'
+or 'W-SHOE:US8.5'.
+
+Sizes are:
+- letter sizes (XXS ... 5XL) and plus sizes (1X ... 4X)
+- W<inches> for waist sizes and C<inches> for chest sizes
+- US<size> for numeric women sizes and US shoe sizes, EU<size> for shoe sizes without a US equivalent
+"""
+import re
+
+from user.models import GenderChoices
+
+
+# Size guide type (e.g. 'Men-Tops') part -> garment type
+GARMENT_TYPES = {
+    'Tops': 'TOP',
+    'Blazers': 'TOP',
+    'Outerwear': 'TOP',
+    'Dresses': 'TOP',
+    'Bottoms': 'BOTTOM',
+    'Footwear': 'SHOE',
+    'Shoes': 'SHOE',
+}
+
+# Category title -> garment of a size guide type, for variants without the size guide of their shop
+CATEGORY_SIZE_GUIDE_GARMENTS = {
+    'Tops & Shirts': 'Tops',
+    'Shirts': 'Tops',
+    'T-Shirts': 'Tops',
+    'Sweaters & Cardigans': 'Tops',
+    'Sweaters': 'Tops',
+    'Outerwear': 'Outerwear',
+    'Dresses': 'Dresses',
+    'Bottoms': 'Bottoms',
+    'Shorts': 'Bottoms',
+    'Shoes': 'Shoes',
+}
+
+LETTER_SIZE_ALIASES = {
+    '2XS': 'XXS',
+    '2XL': 'XXL',
+    'XXXL': '3XL',
+    'X': '1X',
+}
+# French size suffixes of bilingual labels, e.g. 'XS/TP' or 'XLTG'
+FRENCH_SIZE_SUFFIXES = ('TP', 'TG', 'P', 'M', 'G')
+
+SIZE_CODE_PATTERN = re.compile(r'^[MW]-(TOP|BOTTOM|SHOE):[A-Z0-9.]{1,8}$')
+LETTER_SIZE_PATTERN = re.compile(r'^(?P<size>\d?X*[SML]|\d?X)(?P<suffix>TP|TG|P|M|G|T)?$')
+WAIST_INSEAM_PATTERN = re.compile(r'^(?P<waist>\d{2})[X/](?P<inseam>\d{2})$')
+NUMERIC_SIZE_PATTERN = re.compile(r'^(?P<size>\d+(\.\d+)?)(R|T)?$')
+
+
+def is_valid_size_code(size_code: str) -> bool:
+    return SIZE_CODE_PATTERN.match(size_code) is not None
+
+
+def _format_number(value: float) -> str:
+    return f'{value:g}'
+
+
+def normalize_letter_size(size: str):
+    if '/' in size:  # Bilingual label, e.g. 'M/M' or 'XL/TG'
+        size = size.split('/')[0]
+
+    match = LETTER_SIZE_PATTERN.match(size)
+    if match is None:
+        return None
+
+    letter_size = match['size']
+    # '2XTG' is a 2XL and not a plus size
+    if match['suffix'] in FRENCH_SIZE_SUFFIXES and letter_size.endswith('X'):
+        letter_size += 'L'
+    return LETTER_SIZE_ALIASES.get(letter_size, letter_size)
+
+
+def normalize_numeric_size(size: str, gender: str, garment_type: str, us_shoe_size=None):
+    waist_inseam = WAIST_INSEAM_PATTERN.match(size)
+    if waist_inseam is not None:
+        return f"W{waist_inseam['waist']}"
+
+    match = NUMERIC_SIZE_PATTERN.match(size)
+    if match is None:
+        return None
+
+    value = float(match['size'])
+    if garment_type == 'SHOE':
+        if us_shoe_size:
+            return f'US{_format_number(float(us_shoe_size))}'
+        # EU sizes start from 30
+        return f'{"EU" if value >= 30 else "US"}{_format_number(value)}'
+    if gender == GenderChoices.MEN:
+        return f'{"W" if garment_type == "BOTTOM" else "C"}{_format_number(value)}'
+    if garment_type == 'BOTTOM' and value > 20:  # Women waist sizes, e.g. 27
+        return f'W{_format_number(value)}'
+    # Numeric women sizes, '00' is smaller than '0'
+    return f'US{match["size"] if match["size"] == "00" else _format_number(value)}'
+
+
+def get_category_size_guide_type(gender: str, category_title: str):
+    """
+    Returns the size guide type (e.g. 'Women-Bottoms') of a category, or None when its garments have no size guide
+    (e.g. activewear). Shoe sizes have no US equivalent then, see normalize_numeric_size.
+    """
+    garment_label = CATEGORY_SIZE_GUIDE_GARMENTS.get(category_title)
+    gender_label = dict(GenderChoices.choices).get(gender)
+    if garment_label is None or gender_label is None:
+        return None
+    return f'{gender_label}-{garment_label}'
+
+
+def get_size_code(size_guide_type: str, size: str, us_shoe_size=None):
+    """
+    Returns the canonical code of a shop size of a size guide type (e.g. 'Women-Bottoms'), or None when the size
+    is not recognized. us_shoe_size is the US equivalent from the shop size guide, if it has one.
+    """
+    if not size_guide_type or not size:
+        return None
+
+    gender_label, _, garment_label = size_guide_type.partition('-')
+    gender = next((value for value, label in GenderChoices.choices if label == gender_label), None)
+    garment_type = GARMENT_TYPES.get(garment_label)
+    if gender is None or garment_type is None:
+        return None
+
+    size = size.strip().upper().replace(' ', '')
+    normalized_size = normalize_letter_size(size)
+    if normalized_size is None:
+        normalized_size = normalize_numeric_size(size, gender, garment_type, us_shoe_size)
+    if normalized_size is None:
+        return None
+
+    return f'{gender}-{garment_type}:{normalized_size}'
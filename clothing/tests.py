@@ -1,12 +1,37 @@
+from base64 import b64encode
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlsplit
+
+from django.apps import apps
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from django.core.files.uploadedfile import SimpleUploadedFile
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
 from rest_framework import status
+from rest_framework.settings import api_settings
 
 from django.contrib.auth import get_user_model
 
-from user.models import GenderChoices
-from .models import Category, Shop, Product, SavedProduct, TrackedProduct
+from user.models import GenderChoices, UserAdditional, SavedSize
+from .pagination import SeededShufflePagination, SearchRankCursorPagination, without_window_filters
+from .management.commands.explain_feed_queries import FEED_INDEXES
+from .cache import get_catalog_cache
+from .fitting import FitScoringEngine, build_size_profiles, refresh_best_fit_variants
+from .signals import suspend_catalog_version_bumps
+from .sizes import get_category_size_guide_type, get_size_code
+from .models import Category, Shop, Product, Attribute, ProductAttribute, Variant, Sizing, SavedVariant, \
+    TrackedVariant, CatalogVersion, SizeProfile, BestFitVariant, SHUFFLE_KEY_RANGE
 
 User = get_user_model()
 
@@ -72,6 +97,26 @@ def create_products(product_image):
     return Product.objects.all()
 
 
+def create_variant(product, original_id, original_price=100, final_price=100, **fields):
+    """Creates an available variant of the product."""
+    fields.setdefault('is_available', True)
+    return Variant.objects.create(
+        original_id=original_id,
+        product=product,
+        image_src='https://shop.chicpic.app/image.png',
+        link='https://shop.chicpic.app/',
+        original_price=original_price,
+        final_price=final_price,
+        **fields
+    )
+
+
+class CatalogTestCase(APITestCase):
+    def setUp(self) -> None:
+        # Start without the cached responses and fit results of the other tests
+        get_catalog_cache().clear()
+
+
 class CategoryTest(APITestCase):
     fixtures = ['categories.json']
 
@@ -125,6 +170,122 @@ class ShopTest(APITestCase):
         self.assertEqual(shops.count(), 2)
         self.assertEqual(shops[0].name, shop1_data.get('name'))
 
+    def test_shops_list_conditional_get(self):
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        CatalogVersion.bump(shop_id=shop.id)
+        url = reverse('shops')
+
+        # Not sent within the second of the last change
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date()).status_code, status.HTTP_200_OK)
+
+        CatalogVersion.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        last_modified = response['Last-Modified']
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # If-Modified-Since is ignored next to If-None-Match
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # catalog version only
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Soft-deleting the shop bumps the catalog version
+        Shop.objects.filter(id=shop.id).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 0)
+
+
+class CatalogVersionTest(CatalogTestCase):
+    def get_versions(self, shop):
+        return (CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE).version,
+                CatalogVersion.get_version(CatalogVersion.shop_scope(shop.id)).version)
+
+    def test_catalog_edits(self):
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        global_version, shop_version = self.get_versions(shop)
+
+        # e.g. admin edits
+        shop.name = 'Shop name'
+        shop.save()
+        self.assertEqual(self.get_versions(shop), (global_version + 1, shop_version + 1))
+
+        product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Shirt')
+        self.assertEqual(self.get_versions(shop), (global_version + 2, shop_version + 2))
+
+        product.hard_delete()
+        self.assertEqual(self.get_versions(shop), (global_version + 3, shop_version + 3))
+
+        category = Category.objects.create(title='Shirts', gender=GenderChoices.WOMEN)
+        category.delete()
+        self.assertEqual(self.get_versions(shop), (global_version + 5, shop_version + 3))
+
+    def test_variant_edits(self):
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Shirt')
+        variant = create_variant(product, 1)
+        product.update_middle_variant()
+        product.save()
+
+        variants_url = reverse('variants')
+        detail_url = reverse('product_detail', kwargs={'product_id': product.id})
+        self.assertEqual(self.client.get(variants_url).json()['results'][0]['finalPrice'], 100)
+        etag = self.client.get(detail_url)['ETag']
+
+        # e.g. an admin edit of the price
+        variant.final_price = 80
+        variant.save()
+        self.assertEqual(self.client.get(variants_url).json()['results'][0]['finalPrice'], 80)
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # and of a sizing
+        versions = self.get_versions(shop)
+        Sizing.objects.create(variant=variant, option=Sizing.SizingOptionChoices.WAIST, value=70)
+        self.assertEqual(self.get_versions(shop), (versions[0] + 1, versions[1] + 1))
+        self.assertNotEqual(self.client.get(detail_url)['ETag'], etag)
+
+    def test_suspended_bumps(self):
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        versions = self.get_versions(shop)
+
+        with suspend_catalog_version_bumps():
+            product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Shirt')
+            product.save()
+            Product.objects.filter(id=product.id).delete()
+            shop.save()
+        self.assertEqual(self.get_versions(shop), versions)
+
+        product.save()
+        self.assertEqual(self.get_versions(shop), (versions[0] + 1, versions[1] + 1))
+
+    def test_token(self):
+        CatalogVersion.bump()
+        catalog_version = CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE)
+        token = catalog_version.token
+
+        CatalogVersion.bump()
+        self.assertNotEqual(CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE).token, token)
+
+        # A reset table starts the versions again, but not the tokens
+        catalog_version.delete()
+        CatalogVersion.objects.create(scope=CatalogVersion.GLOBAL_SCOPE, version=catalog_version.version)
+        self.assertNotEqual(CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE).token, token)
+
 
 class ProductTest(APITestCase):
     def setUp(self) -> None:
@@ -185,3 +346,648 @@ class ProductTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json()), 1)
+
+
+class ProductDetailTest(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=self.user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Shirt')
+
+        fit = Attribute.objects.create(name='Fit')
+        length = Attribute.objects.create(name='Length')
+        ProductAttribute.objects.create(product=self.product, attribute=fit, position=1)
+        ProductAttribute.objects.create(product=self.product, attribute=length, position=2)
+
+        Variant.objects.bulk_create([
+            Variant(
+                original_id=index + 1,
+                product=self.product,
+                image_src='https://shop.chicpic.app/image.png',
+                link='https://shop.chicpic.app/',
+                original_price=100,
+                final_price=80,
+                is_available=True,
+                option1=('Slim', 'Regular')[index % 2],
+                option2=('Short', 'Regular', 'Tall')[index % 3],
+            ) for index in range(40)
+        ])
+        self.variants = list(Variant.objects.filter(product=self.product))
+
+        SavedVariant.objects.create(user=self.user, variant=self.variants[0])
+        TrackedVariant.objects.create(user=self.user, variant=self.variants[0])
+        TrackedVariant.objects.create(user=self.user, variant=self.variants[1])
+
+    def test_product_detail_query_count(self):
+        url = reverse('product_detail', kwargs={'product_id': self.product.id})
+
+        # saved variants, tracked variants, catalog version, product with shop, variants, categories and attributes
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        variants = {variant['id']: variant for variant in response.json().get('variants')}
+        self.assertEqual(len(variants), 40)
+        self.assertTrue(variants[self.variants[0].id]['isSaved'])
+        self.assertTrue(variants[self.variants[0].id]['isTracked'])
+        self.assertFalse(variants[self.variants[1].id]['isSaved'])
+        self.assertTrue(variants[self.variants[1].id]['isTracked'])
+        self.assertFalse(variants[self.variants[2].id]['isSaved'])
+        self.assertFalse(variants[self.variants[2].id]['isTracked'])
+
+        attributes = {attribute['name']: attribute['values'] for attribute in response.json().get('attributes')}
+        self.assertCountEqual(attributes['Fit'], ['Slim', 'Regular'])
+        self.assertCountEqual(attributes['Length'], ['Short', 'Regular', 'Tall'])
+
+    def test_product_detail_deleted_saved_variants(self):
+        url = reverse('product_detail', kwargs={'product_id': self.product.id})
+        etag = self.client.get(url)['ETag']
+
+        # Unsaved and untracked variants are not flagged
+        SavedVariant.objects.filter(variant=self.variants[0]).update(is_deleted=True)
+        TrackedVariant.objects.filter(variant=self.variants[1]).update(is_deleted=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        variants = {variant['id']: variant for variant in response.json().get('variants')}
+        self.assertFalse(variants[self.variants[0].id]['isSaved'])
+        self.assertTrue(variants[self.variants[0].id]['isTracked'])
+        self.assertFalse(variants[self.variants[1].id]['isTracked'])
+
+    def test_product_detail_conditional_get(self):
+        CatalogVersion.bump(shop_id=self.product.shop_id)
+        url = reverse('product_detail', kwargs={'product_id': self.product.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # saved variants, tracked variants and catalog version only
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # Saving a variant changes the detail of the user
+        SavedVariant.objects.create(user=self.user, variant=self.variants[1])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Soft-deleting the product bumps the catalog version
+        self.product.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class VariantMeasurementsTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        UserAdditional.objects.create(
+            user=self.user, gender_interested=GenderChoices.WOMEN, weight=60, height=170, shoulder_size=40, bust_size=90,
+            waist_size=70, hips_size=95, inseam=80, shoe_size=8
+        )
+        self.client.force_authenticate(user=self.user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Pants')
+        self.variants = {}
+        for index, (size, waist, hips) in enumerate([('S', 66, 91), ('M', 71, 96), ('L', 76, 101)]):
+            variant = create_variant(self.product, index + 1, size=size)
+            sizings = Sizing.objects.bulk_create([
+                Sizing(variant=variant, option=Sizing.SizingOptionChoices.WAIST, value=waist),
+                Sizing(variant=variant, option=Sizing.SizingOptionChoices.HIPS, value=hips),
+            ])
+            variant.set_measurements(sizings)
+            variant.save()
+            self.variants[size] = variant
+
+    def test_set_measurements(self):
+        variant = self.variants['S']
+        variant.set_measurements([Sizing(variant=variant, option=Sizing.SizingOptionChoices.INSEAM, value=81),
+                                  Sizing(variant=variant, option=Sizing.SizingOptionChoices.HEIGHT, value=170)])
+
+        self.assertEqual(variant.inseam, 81)
+        # Measurements of the previous sizings are cleared, and the options without a column are ignored
+        self.assertIsNone(variant.waist)
+        self.assertIsNone(variant.hips)
+
+    @skipUnless(connection.vendor == 'postgresql', 'The best-fit ranking uses numeric window expressions')
+    @override_settings(FIT_SCORING_BACKEND='sql')
+    def test_best_fit_variant(self):
+        # The best fit is scored from the variant columns, without the sizings
+        Sizing.objects.all().delete()
+
+        response = self.client.get(reverse('variants') + '?recom=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [self.variants['M'].id])
+
+
+class DiscountFilterTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.discounted_product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Shirt')
+        self.full_price_product = Product.objects.create(original_id=2, shop=shop, brand='Brand', title='Pants')
+
+        for index, (product, final_price) in enumerate([(self.discounted_product, '65.00'),
+                                                        (self.full_price_product, '100.00')]):
+            create_variant(product, index + 1, original_price='100.00', final_price=final_price)
+            product.update_middle_variant()
+            product.save()
+
+    def test_discount_rate(self):
+        self.assertEqual(self.discounted_product.variants.get().discount_rate, 35)
+        self.assertTrue(self.discounted_product.variants.get().has_discount)
+        self.assertFalse(self.full_price_product.variants.get().has_discount)
+
+    def test_edited_prices(self):
+        # e.g. an admin edit
+        variant = self.full_price_product.variants.get()
+        variant.final_price = '50.00'
+        variant.save(update_fields=['final_price'])
+        variant.refresh_from_db()
+        self.assertEqual(variant.discount_rate, 50)
+
+        response = self.client.get(reverse('variants') + '?discount=40')
+        self.assertEqual([variant['product'] for variant in response.json()['results']], [self.full_price_product.id])
+
+    def test_discounted_variants(self):
+        response = self.client.get(reverse('variants') + '?discount=30')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual([variant['product'] for variant in results], [self.discounted_product.id])
+        self.assertEqual(results[0]['discountRate'], 35)
+
+    def test_discounted_products(self):
+        response = self.client.get(reverse('products') + '?discount=30')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.discounted_product.id])
+
+    def test_small_discount(self):
+        product = Product.objects.create(original_id=3, shop=Shop.objects.get(), brand='Brand', title='Skirt')
+        variant = create_variant(product, 3, original_price='100.00', final_price='99.50')
+        product.update_summary()
+        product.save()
+        variant.refresh_from_db()
+
+        # Discounts under 1% have a discount rate of 0, but are still discounts
+        self.assertEqual(variant.discount_rate, 0)
+        self.assertTrue(variant.has_discount)
+        self.assertTrue(product.has_discount)
+
+    def test_products_preview_query_count(self):
+        for product in (self.discounted_product, self.full_price_product):
+            product.update_summary()
+            product.save()
+
+        # Catalog version, count and products. The discount flag is read from the product summary, without a query
+        # per product.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('products'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({product['id']: product['hasDiscount'] for product in response.json()['results']},
+                         {self.discounted_product.id: True, self.full_price_product.id: False})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Full-text and trigram search need PostgreSQL')
+class VariantSearchTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+
+        shop = Shop.objects.create(name='Acme', website='https://shop.chicpic.app/')
+        self.title_match = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Linen Shirt')
+        self.description_match = Product.objects.create(original_id=2, shop=shop, brand='Brand', title='Pants',
+                                                        description='Wear them with a linen shirt.')
+        self.brand_product = Product.objects.create(original_id=3, shop=shop, brand='Patagonia', title='Jacket')
+        for product in (self.title_match, self.description_match, self.brand_product):
+            create_variant(product, product.original_id)
+            product.update_middle_variant()
+            product.save()
+        Product.objects.filter(shop=shop).update(search_document=Product.search_document_vector(shop.name))
+
+    def search(self, query):
+        response = self.client.get(reverse('search_variants'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [variant['product'] for variant in response.json()['results']]
+
+    def test_rank_order(self):
+        # Title matches rank above description matches
+        self.assertEqual(self.search('linen'), [self.title_match.id, self.description_match.id])
+
+    def test_shop_name(self):
+        self.assertCountEqual(self.search('acme'),
+                              [self.title_match.id, self.description_match.id, self.brand_product.id])
+
+    def test_misspelled_brand(self):
+        # No full-text match, found by the trigram similarity of the brand
+        self.assertEqual(self.search('patagonai'), [self.brand_product.id])
+
+    def test_cursor_pages(self):
+        products = []
+        url = reverse('search_variants') + '?q=acme&pagination=cursor'
+        # A page per variant, so every page but the first one starts at a cursor
+        with mock.patch.object(SearchRankCursorPagination, 'page_size', 1):
+            while url is not None:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                products += [variant['product'] for variant in response.json()['results']]
+                url = response.json()['next']
+        # The rank order of the page numbers
+        self.assertEqual(products, self.search('acme'))
+
+
+class GenderFilterTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Dress')
+        # Two categories of the same gender
+        self.product.categories.set([Category.objects.create(title='New In', gender=GenderChoices.WOMEN),
+                                     Category.objects.create(title='Dresses', gender=GenderChoices.WOMEN)])
+        create_variant(self.product, 1)
+        self.product.update_middle_variant()
+        self.product.save()
+
+    def test_product_in_several_categories_of_the_gender(self):
+        response = self.client.get(reverse('variants') + f'?gender={GenderChoices.WOMEN}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([variant['product'] for variant in response.json()['results']], [self.product.id])
+
+        response = self.client.get(reverse('variants') + f'?gender={GenderChoices.MEN}')
+        self.assertEqual(response.json()['results'], [])
+
+    @override_settings(FIT_SCORING_BACKEND='profiles')
+    def test_size_profile_recommendations(self):
+        user = User.objects.create_user(email='user2@chicpic.app', username='user_user2', password='test1234')
+        UserAdditional.objects.create(user=user, gender_interested=GenderChoices.WOMEN, weight=60, height=170,
+                                      shoulder_size=40, bust_size=90, waist_size=70, hips_size=95, inseam=80,
+                                      shoe_size=8)
+        build_size_profiles()
+        refresh_best_fit_variants()
+        self.client.force_authenticate(user=user)
+
+        for url in (reverse('shop_variants', kwargs={'shop_id': self.product.shop_id}),
+                    reverse('explore_variants') + '?seed=1'):
+            response = self.client.get(url + ('&' if '?' in url else '?') + 'recom=true')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([variant['product'] for variant in response.json()['results']], [self.product.id])
+
+
+class FitScoringEngineTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.user_additional = UserAdditional.objects.create(
+            user=self.user, gender_interested=GenderChoices.WOMEN, weight=60, height=170, shoulder_size=40, bust_size=90,
+            waist_size=70, hips_size=95, inseam=80, shoe_size=8
+        )
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.product = Product.objects.create(original_id=1, shop=shop, brand='Brand', title='Pants')
+        self.variants = {}
+        for index, (size, waist, hips, is_available) in enumerate([('S', 66, 91, True), ('M', 71, 96, False),
+                                                                  ('L', 76, 101, True), ('XL', None, None, True)]):
+            self.variants[size] = create_variant(self.product, index + 1, is_available=is_available, size=size,
+                                                 waist=waist, hips=hips)
+
+    def test_best_fit_variant(self):
+        engine = FitScoringEngine()
+        self.assertEqual(len(engine), 4)
+
+        # M fits best, but it is not available
+        self.assertEqual(engine.best_fit_variant_ids(self.user_additional).tolist(), [self.variants['S'].id])
+        self.assertEqual(engine.best_fit_variant_ids(self.user_additional, shop_id=self.product.shop_id + 1).tolist(),
+                         [])
+        # e.g. the products matching a search
+        self.assertEqual(engine.best_fit_variant_ids(self.user_additional, product_ids=[self.product.id]).tolist(),
+                         [self.variants['S'].id])
+        self.assertEqual(engine.best_fit_variant_ids(self.user_additional, product_ids=[]).tolist(), [])
+
+    def test_benchmark_fit_scoring_without_runs(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_fit_scoring', repeat=0, stdout=StringIO())
+
+    def test_variants_without_measurements(self):
+        Variant.objects.filter(size__in=['S', 'L']).update(is_available=False)
+
+        engine = FitScoringEngine()
+        self.assertEqual(engine.best_fit_variant_ids(self.user_additional).tolist(), [self.variants['XL'].id])
+
+    @override_settings(FIT_SCORING_BACKEND='numpy')
+    def test_recommendations_cache(self):
+        self.client.force_authenticate(user=self.user)
+        CatalogVersion.bump(shop_id=self.product.shop_id)
+        url = reverse('variants') + '?recom=true'
+
+        response = self.client.get(url)
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [self.variants['S'].id])
+
+        # catalog version and the variants of the page
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [self.variants['S'].id])
+
+        # Editing the measurements drops the cached results
+        self.client.patch(reverse('user_additional', kwargs={'id': self.user.id}), {'waist_size': 76, 'hips_size': 101},
+                          format='json')
+        self.client.force_authenticate(user=User.objects.get(id=self.user.id))
+        response = self.client.get(url)
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [self.variants['L'].id])
+
+    def test_size_profiles(self):
+        size_profiles = build_size_profiles()
+        self.assertEqual(len(size_profiles), 1)
+        self.assertEqual(size_profiles[0].waist_size, 70)
+        self.assertIsNone(size_profiles[0].chest_size)
+        self.assertEqual(SizeProfile.get_nearest(self.user_additional), size_profiles[0])
+
+        self.assertEqual(refresh_best_fit_variants(), 1)
+        self.assertEqual(BestFitVariant.objects.get().variant, self.variants['S'])
+
+        # Incremental refresh of a product
+        Variant.objects.filter(id=self.variants['M'].id).update(is_available=True)
+        self.assertEqual(refresh_best_fit_variants(product_ids=[self.product.id]), 1)
+        self.assertEqual(BestFitVariant.objects.get().variant, self.variants['M'])
+
+        with override_settings(FIT_SCORING_BACKEND='profiles'):
+            self.client.force_authenticate(user=self.user)
+            response = self.client.get(reverse('variants') + '?recom=true')
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [self.variants['M'].id])
+
+
+class SizeCodeTest(SimpleTestCase):
+    def test_letter_sizes(self):
+        self.assertEqual(get_size_code('Men-Tops', 'XL'), 'M-TOP:XL')
+        self.assertEqual(get_size_code('Men-Outerwear', 'XS/TP'), 'M-TOP:XS')
+        self.assertEqual(get_size_code('Men-Tops', '2XLTG'), 'M-TOP:XXL')
+        self.assertEqual(get_size_code('Women-Outerwear', '2X'), 'W-TOP:2X')
+
+    def test_numeric_sizes(self):
+        self.assertEqual(get_size_code('Men-Bottoms', '32X30'), 'M-BOTTOM:W32')
+        self.assertEqual(get_size_code('Men-Bottoms', '32'), 'M-BOTTOM:W32')
+        self.assertEqual(get_size_code('Women-Bottoms', '00'), 'W-BOTTOM:US00')
+        self.assertEqual(get_size_code('Women-Bottoms', '27'), 'W-BOTTOM:W27')
+        self.assertEqual(get_size_code('Men-Blazers', '40R'), 'M-TOP:C40')
+
+    def test_shoe_sizes(self):
+        self.assertEqual(get_size_code('Men-Footwear', '42', us_shoe_size='9'), 'M-SHOE:US9')
+        self.assertEqual(get_size_code('Women-Footwear', '8.5'), 'W-SHOE:US8.5')
+        self.assertEqual(get_size_code('Women-Footwear', '38.5'), 'W-SHOE:EU38.5')
+
+    def test_unknown_sizes(self):
+        self.assertIsNone(get_size_code(None, 'M'))
+        self.assertIsNone(get_size_code('Women-Tops', 'One Size'))
+
+    def test_category_size_guide_types(self):
+        self.assertEqual(get_category_size_guide_type(GenderChoices.MEN, 'T-Shirts'), 'Men-Tops')
+        self.assertEqual(get_category_size_guide_type(GenderChoices.WOMEN, 'Shorts'), 'Women-Bottoms')
+        self.assertEqual(get_size_code(get_category_size_guide_type(GenderChoices.WOMEN, 'Shoes'), '38'), 'W-SHOE:EU38')
+        self.assertIsNone(get_category_size_guide_type(GenderChoices.WOMEN, 'Activewear'))
+
+
+class MySizeFilterTest(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        user_additional = UserAdditional.objects.create(
+            user=self.user, gender_interested=GenderChoices.WOMEN, weight=60, height=170, shoulder_size=40,
+            bust_size=90, waist_size=70, hips_size=95, inseam=80, shoe_size=8
+        )
+        SavedSize.objects.create(user_additional=user_additional, size_code='W-TOP:M')
+        self.client.force_authenticate(user=self.user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        self.products = [Product.objects.create(original_id=index, shop=shop, brand='Brand', title='Shirt')
+                         for index in range(3)]
+        for index, (product, size) in enumerate([(self.products[0], 'S'), (self.products[0], 'M'),
+                                                 (self.products[1], 'L'), (self.products[2], 'M/M')]):
+            create_variant(product, index + 1, size=size, size_code=get_size_code('Women-Tops', size))
+
+    def test_my_size_variants(self):
+        response = self.client.get(reverse('variants') + '?my_size=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual([(variant['product'], variant['size']) for variant in response.json()['results']],
+                              [(self.products[0].id, 'M'), (self.products[2].id, 'M/M')])
+
+    def test_my_size_discounted_variants(self):
+        # A second M of the first product, on sale
+        discounted_variant = create_variant(self.products[0], 5, final_price=60, size='M',
+                                            size_code=get_size_code('Women-Tops', 'M'))
+
+        response = self.client.get(reverse('variants') + '?my_size=true&discount=30')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([variant['id'] for variant in response.json()['results']], [discounted_variant.id])
+
+    def test_backfill_size_codes(self):
+        backfill_size_codes = import_module('clothing.migrations.0028_backfill_variant_size_code').backfill_size_codes
+        Variant.objects.update(size_code=None)
+        activewear = Category.objects.create(title='Activewear', gender=GenderChoices.WOMEN)
+        tops = Category.objects.create(title='Tops & Shirts', gender=GenderChoices.WOMEN)
+        self.products[0].categories.set([activewear, tops])
+        # No size guide for the categories of the other products
+        self.products[1].categories.set([activewear])
+
+        backfill_size_codes(apps, None)
+        self.assertCountEqual(Variant.objects.values_list('size', 'size_code'),
+                              [('S', 'W-TOP:S'), ('M', 'W-TOP:M'), ('L', None), ('M/M', None)])
+
+        response = self.client.get(reverse('variants') + '?my_size=true')
+        self.assertEqual([(variant['product'], variant['size']) for variant in response.json()['results']],
+                         [(self.products[0].id, 'M')])
+
+
+class FeedPaginationTestCase(CatalogTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        user = User.objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+
+        shop = Shop.objects.create(name='Shop', website='https://shop.chicpic.app/')
+        for index in range(30):
+            product = Product.objects.create(original_id=index, shop=shop, brand='Brand', title='Shirt')
+            create_variant(product, index)
+            product.update_middle_variant()
+            product.save()
+
+    def get_all_pages(self, url):
+        variant_ids = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            variant_ids += [variant['id'] for variant in response.json()['results']]
+            url = response.json()['next']
+        return variant_ids
+
+
+class VariantFeedPaginationTest(FeedPaginationTestCase):
+    def test_cursor_pages(self):
+        variant_ids = self.get_all_pages(reverse('variants') + '?pagination=cursor')
+        # Every variant once, in id order
+        self.assertEqual(variant_ids, list(Variant.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_stable_next_cursor(self):
+        url = reverse('variants') + '?pagination=cursor'
+        first_page = self.client.get(url).json()
+        self.assertIsNotNone(first_page['next'])
+        self.assertEqual(self.client.get(url).json()['next'], first_page['next'])
+
+        # A variant added after the first page does not shift the next page
+        product = Product.objects.create(original_id=30, shop=Shop.objects.get(), brand='Brand', title='Shirt')
+        create_variant(product, 30)
+        product.update_middle_variant()
+        product.save()
+        next_page = self.client.get(first_page['next']).json()
+        self.assertEqual([variant['id'] for variant in next_page['results']],
+                         list(Variant.objects.order_by('-id').values_list('id', flat=True))[api_settings.PAGE_SIZE + 1:])
+
+    def test_without_window_filters(self):
+        queryset = Variant.objects.filter(is_available=True)
+        self.assertIs(without_window_filters(queryset), queryset)
+
+        product = Product.objects.first()
+        first_variant = product.variants.get()
+        last_variant = create_variant(product, 30)
+        # Last variant of every product
+        ranked_queryset = Variant.objects.annotate(
+            rn=Window(expression=RowNumber(), partition_by=[F('product_id')], order_by=(F('id').desc(),))
+        ).filter(rn=1)
+        unranked_queryset = without_window_filters(ranked_queryset)
+        self.assertCountEqual(unranked_queryset, ranked_queryset)
+        self.assertNotIn(first_variant, unranked_queryset)
+
+        # A cursor condition on the ranked variants does not rank the remaining variants again
+        self.assertNotIn(first_variant, unranked_queryset.filter(id__lt=last_variant.id))
+
+
+class SeededShufflePaginationTest(FeedPaginationTestCase):
+    def get_shuffled_variant_ids(self, seed):
+        return self.get_all_pages(reverse('explore_variants') + f'?seed={seed}')
+
+    def test_full_pass(self):
+        variant_ids = self.get_shuffled_variant_ids(1)
+        # Every variant once
+        self.assertEqual(len(variant_ids), Variant.objects.count())
+        self.assertCountEqual(variant_ids, Variant.objects.values_list('id', flat=True))
+        # The same seed gives the same order
+        self.assertEqual(self.get_shuffled_variant_ids(1), variant_ids)
+
+    def test_seed_order(self):
+        request = APIRequestFactory().get('/', {'seed': 7})
+        start_key = SeededShufflePagination().get_start_key(Request(request))
+        # From the start key to the end of the key range, then from the beginning of the key range
+        variants = Variant.objects.all()
+        self.assertEqual(self.get_shuffled_variant_ids(7),
+                         [variant.id for variant in sorted(variants, key=lambda variant: (
+                             variant.shuffle_key < start_key, variant.shuffle_key, variant.id))])
+
+    def test_wrap_around(self):
+        # The start key splits the variants between the two laps, and a page spans both of them
+        keys = sorted(Variant.objects.values_list('shuffle_key', flat=True))
+        start_key = keys[api_settings.PAGE_SIZE // 2]
+        with mock.patch.object(SeededShufflePagination, 'get_start_key', return_value=start_key):
+            variant_ids = self.get_shuffled_variant_ids(100)
+        self.assertEqual(variant_ids, list(
+            Variant.objects.filter(shuffle_key__gte=start_key).order_by('shuffle_key', 'id').values_list('id', flat=True)
+        ) + list(
+            Variant.objects.filter(shuffle_key__lt=start_key).order_by('shuffle_key', 'id').values_list('id', flat=True)
+        ))
+
+    def test_different_seeds(self):
+        # Evenly spread shuffle keys, so the start keys of the seeds fall between different variants
+        for index, variant in enumerate(Variant.objects.order_by('id')):
+            variant.shuffle_key = index * (SHUFFLE_KEY_RANGE // Variant.objects.count())
+            variant.save(update_fields=['shuffle_key'])
+
+        orders = [self.get_shuffled_variant_ids(seed) for seed in range(5)]
+        self.assertGreater(len({tuple(order) for order in orders}), 1)
+        # The seeds serve the same cyclic order, rotated
+        for order in orders[1:]:
+            offset = order.index(orders[0][0])
+            self.assertEqual(order[offset:] + order[:offset], orders[0])
+
+    def test_cursor_mode_without_seed(self):
+        response = self.client.get(reverse('explore_variants') + '?pagination=cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor(self):
+        pagination = SeededShufflePagination()
+        pagination.base_url = 'http://testserver/clothing/explore/variants/?seed=1'
+        next_link = pagination.encode_cursor((1, 123456, 42))
+        cursor = QueryDict(urlsplit(next_link).query)[pagination.cursor_query_param]
+        request = Request(APIRequestFactory().get('/', {'seed': 1, 'cursor': cursor}))
+        self.assertEqual(pagination.decode_cursor(request), (1, 123456, 42))
+
+        for cursor in ('not a cursor', b64encode(b'1:2').decode('ascii'), b64encode(b'2:1:2').decode('ascii'),
+                       b64encode(b'a:b:c').decode('ascii'), 'é'):
+            response = self.client.get(reverse('explore_variants'), {'seed': 1, 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_seed(self):
+        response = self.client.get(reverse('explore_variants') + '?seed=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GenerateCatalogTest(APITestCase):
+    fixtures = ['categories.json']
+
+    def test_generate_catalog(self):
+        call_command('generate_catalog', shops=2, variants=300, users=5, saved_variants=2, stdout=StringIO())
+
+        self.assertEqual(Shop.objects.count(), 2)
+        self.assertGreaterEqual(Variant.objects.count(), 300)
+        self.assertEqual(UserAdditional.objects.count(), 5)
+        self.assertEqual(SavedVariant.objects.count(), 10)
+        # Denormalized columns are filled like the integrator fills them
+        self.assertFalse(Variant.objects.filter(size_code__isnull=True).exists())
+        self.assertFalse(Product.objects.filter(categories__isnull=True).exists())
+        for product in Product.objects.filter(middle_variant__isnull=False)[:5]:
+            middle_variant_id = product.middle_variant_id
+            product.update_middle_variant()
+            self.assertEqual(product.middle_variant_id, middle_variant_id)
+
+
+class FeedIndexesTest(APITestCase):
+    fixtures = ['categories.json']
+
+    def test_feed_indexes(self):
+        index_names = set()
+        with connection.cursor() as cursor:
+            for model in (Product, Product.categories.through, Variant, SavedVariant, TrackedVariant):
+                index_names.update(connection.introspection.get_constraints(cursor, model._meta.db_table))
+        self.assertLessEqual(set(FEED_INDEXES), index_names)
+
+    @skipUnless(connection.vendor == 'postgresql', 'The feed indexes are compared on PostgreSQL only')
+    def test_explain_feed_queries(self):
+        call_command('generate_catalog', shops=1, variants=100, users=2, saved_variants=1, stdout=StringIO())
+        # The best fits are explained for a user interested in the gender of the largest category
+        category = Category.objects.annotate(products_count=Count('products')).order_by('-products_count').first()
+        UserAdditional.objects.update(gender_interested=category.gender)
+
+        stdout = StringIO()
+        call_command('explain_feed_queries', stdout=stdout)
+        self.assertIn('before the feed indexes', stdout.getvalue())
+        self.assertIn('after the feed indexes', stdout.getvalue())
+        # The window filter of the best fits is explained as one query
+        self.assertIn('category best fit', stdout.getvalue())
+        # The dropped indexes are restored
+        self.test_feed_indexes()
+
+    @skipUnless(connection.vendor != 'postgresql', 'Checks the other databases')
+    def test_explain_feed_queries_other_databases(self):
+        with self.assertRaises(CommandError):
+            call_command('explain_feed_queries', stdout=StringIO())
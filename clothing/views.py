@@ -1,41 +1,86 @@
-from django.db.models import Q, F, Case, When, DecimalField, Sum, Window, IntegerField, Count
-from django.db.models.functions import Abs, RowNumber, Ceil
+import hashlib
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Q, F, Case, When, DecimalField, FloatField, Window, Value, Exists, OuterRef, Min
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Abs, RowNumber, Coalesce, Cast
 from rest_framework import status
 from rest_framework.generics import ListAPIView, RetrieveAPIView, get_object_or_404
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from user.models import UserAdditional
-from .models import Category, Product, Shop, Variant, TrackedVariant, SavedVariant
+from core.metrics import record_cache_lookup
+from user.models import UserAdditional, SavedSize
+from .cache import CatalogCacheMixin, get_catalog_cache, get_fit_profile_key, get_fit_profile_version, make_etag, \
+    set_validators, get_not_modified_response
+from .fitting import MEASUREMENT_USER_FIELDS, get_fit_engine
+from .models import Category, Product, Shop, Variant, TrackedVariant, SavedVariant, CatalogVersion, SizeProfile, \
+    BestFitVariant
+from .pagination import VariantFeedPagination, VariantSearchPagination, ExploreVariantsPagination, \
+    SeededShufflePagination
 from .serializers import CategorySerializer, ShopSerializer, ProductPreviewSerializer, \
     VariantPreviewSerializer, ProductDetailSerializer, SavedVariantSerializer, TrackedVariantSerializer
 
 
-def get_best_fit_variant(user_additional: UserAdditional, sorted_variants_queryset):
+MEASUREMENT_OUTPUT_FIELD = DecimalField(max_digits=5, decimal_places=1)
+
+
+def get_best_fit_variant(user_additional: UserAdditional, sorted_variants_queryset, **candidate_filters):
+    """
+    Keeps the best fitting available variant of every product in the queryset.
+
+    With the 'numpy' FIT_SCORING_BACKEND the variants are scored in process by the FitScoringEngine. The
+    candidate filters (category_id, shop_id, gender, min_discount_rate, product_ids) narrow the variants it scores
+    and must match the variant filters of the queryset. The SQL backend ranks the queryset itself and ignores them.
+
+    The 'profiles' backend serves the precomputed best-fit variants of the size profile closest to the user. They
+    are the best fits among all available variants of a product, so variant filters (e.g. discount) can drop a
+    product instead of falling back to its next best variant. Without size profiles the SQL backend is used.
+    """
+    if settings.FIT_SCORING_BACKEND == 'profiles':
+        size_profile = SizeProfile.get_nearest(user_additional)
+        if size_profile is not None:
+            return sorted_variants_queryset.filter(
+                Exists(BestFitVariant.objects.filter(size_profile=size_profile, variant_id=OuterRef('id'))),
+                product__is_deleted=False,
+                is_available=True
+            )
+
+    if settings.FIT_SCORING_BACKEND == 'numpy':
+        best_fit_variant_ids = get_fit_engine().best_fit_variant_ids(user_additional, **candidate_filters)
+        return filter_variant_ids(sorted_variants_queryset, best_fit_variant_ids.tolist()).filter(
+            product__is_deleted=False,
+            is_available=True
+        )
+
     # TODO: handle One Size Fit All (OSFA) products
-    shoulder_size = user_additional.shoulder_size
-    bust_size = user_additional.bust_size
-    chest_size = user_additional.chest_size
-    waist_size = user_additional.waist_size
-    hips_size = user_additional.hips_size
-    inseam = user_additional.inseam
-    shoe_size = user_additional.shoe_size
+    diff_fields = []
+    diffs = []
+    for variant_field, user_field in MEASUREMENT_USER_FIELDS:
+        user_value = getattr(user_additional, user_field)
+        if user_value is None:
+            continue
+        diff_fields.append(variant_field)
+        diffs.append(Coalesce(Abs(F(variant_field) - user_value), Value(0), output_field=MEASUREMENT_OUTPUT_FIELD))
+
+    # Variants without any comparable measurement get a NULL score, so they are ranked last
+    has_measurements = Q()
+    for variant_field in diff_fields:
+        has_measurements |= Q(**{f'{variant_field}__isnull': False})
 
     # Filter variants based on gender and categories
     queryset = sorted_variants_queryset.filter(
         product__is_deleted=False
     ).annotate(
-        diff_sum=Sum(
-            Case(
-                When(sizings__option='Shoulder', then=Abs(F('sizings__value') - shoulder_size)),
-                When(sizings__option='Bust', then=Abs(F('sizings__value') - bust_size)),
-                When(sizings__option='Chest', then=Abs(F('sizings__value') - chest_size)),
-                When(sizings__option='Waist', then=Abs(F('sizings__value') - waist_size)),
-                When(sizings__option='Hips', then=Abs(F('sizings__value') - hips_size)),
-                When(sizings__option='Inseam', then=Abs(F('sizings__value') - inseam)),
-                When(sizings__option='Shoe Size', then=Abs(F('sizings__value') - shoe_size)),
-                output_field=DecimalField(max_digits=4, decimal_places=1)
-            )
+        diff_sum=Case(
+            When(has_measurements, then=reduce(operator.add, diffs)),
+            default=None,
+            output_field=MEASUREMENT_OUTPUT_FIELD
         )
     ).annotate(
         rn=Window(
@@ -48,31 +93,135 @@ def get_best_fit_variant(user_additional: UserAdditional, sorted_variants_querys
     return queryset
 
 
+def filter_variant_ids(variants_queryset, variant_ids):
+    """
+    Keeps the variants of the ids. On PostgreSQL the ids are one array parameter of a subquery, instead of an IN list
+    with a parameter per id, which is slow to build and to plan for the best-fit variants of a whole feed.
+    """
+    if connection.vendor == 'postgresql':
+        return variants_queryset.filter(id__in=RawSQL('SELECT unnest(%s::bigint[])', (variant_ids,)))
+    return variants_queryset.filter(id__in=variant_ids)
+
+
+def get_recommendation_user_additional(request):
+    """Returns the user additional info when recommendations are requested (?recom=true) and the user has it."""
+    # Get the boolean value of a query parameter
+    show_recommendations_qp = request.query_params.get('recom')
+    show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
+
+    if not show_recommendations:
+        return None
+
+    try:
+        return request.user.additional
+    except UserAdditional.DoesNotExist:
+        return None
+
+
+def is_my_size_requested(request):
+    my_size_qp = request.query_params.get('my_size')
+    return my_size_qp is not None and my_size_qp.lower() in ('true', '1')
+
+
+def get_my_size_codes(request):
+    """Returns the saved size codes of the user when the feed is limited to their sizes (?my_size=true)."""
+    if not is_my_size_requested(request):
+        return None
+
+    size_codes = list(SavedSize.objects.filter(user_additional__user=request.user).values_list('size_code', flat=True))
+    # Users without saved sizes get the whole feed
+    return size_codes or None
+
+
+def get_my_size_variants(sorted_variants_queryset, size_codes):
+    queryset = sorted_variants_queryset.filter(
+        product__is_deleted=False,
+        size_code__in=size_codes,
+        is_available=True
+    )
+
+    # One variant per product, the first one that passes the feed filters (e.g. discount)
+    my_size_variant_ids = queryset.order_by().values('product_id').annotate(first_id=Min('id')).values('first_id')
+
+    return queryset.filter(id__in=my_size_variant_ids)
+
+
+def filter_category_gender(variants_queryset, gender):
+    """
+    Keeps the variants of the products with a category of the gender. It is an EXISTS subquery, since a join on the
+    categories would return the variants of a product in several categories of the gender once per category.
+    """
+    return variants_queryset.filter(Exists(
+        Product.categories.through.objects.filter(product_id=OuterRef('product_id'), category__gender=gender)
+    ))
+
+
 def get_middle_variants(sorted_variants_queryset):
+    # Middle variants are selected per product by the integrator (see Product.update_middle_variant)
     queryset = sorted_variants_queryset.filter(
         product__is_deleted=False,
+        product__middle_variant=F('id'),
         is_available=True
-    ).annotate(
-        row_number=Window(
-            expression=RowNumber(output_field=IntegerField()),
-            partition_by=[F('product_id')],
-            order_by=(F('id'),)
-        ),
-        num_variants=Count('product__variants', distinct=True, output_field=IntegerField())
-    ).annotate(
-        middle_variant_id=Case(
-            When(row_number=Ceil(F('num_variants') / 2), then=F('id')),
-            default=None,
-            output_field=IntegerField()
-        )
-    ).filter(
-        middle_variant_id=F('id')
     )
 
     return queryset
 
 
-class CategoriesView(ListAPIView):
+class VariantFeedCacheMixin(CatalogCacheMixin):
+    """
+    Besides the catalog responses, caches the best-fit ordering of recommendation requests (?recom=true).
+
+    The ordering is a list of variant ids, cached per size profile (see get_fit_profile_key), so users with
+    near-identical measurements share it and every page is a slice of it. It is invalidated by the catalog
+    version and by the users of the profile editing their measurements.
+    """
+
+    def is_response_cacheable(self):
+        # Recommendations depend on the user measurements, and the size filter on the saved sizes
+        return get_recommendation_user_additional(self.request) is None and not is_my_size_requested(self.request)
+
+    def is_fit_result_cacheable(self):
+        # The cursor modes page through the queryset itself
+        return isinstance(self.paginator.get_paginator(self.request), PageNumberPagination) and \
+            not is_my_size_requested(self.request)
+
+    def get_fit_result_cache_key(self, catalog_version: CatalogVersion, user_additional: UserAdditional):
+        request = self.request
+        page_query_param = PageNumberPagination.page_query_param
+        query = sorted((key, value) for key, values in request.query_params.lists() for value in values
+                       if key != page_query_param)
+        kwargs = sorted(self.kwargs.items())
+        profile_key = get_fit_profile_key(user_additional)
+        raw_key = f'{query}:{kwargs}:{profile_key}'
+        return f'fit:{self.__class__.__name__}:{catalog_version.scope}:{catalog_version.version}:' \
+               f'{catalog_version.token.hex}:{get_fit_profile_version(profile_key)}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        user_additional = get_recommendation_user_additional(request)
+        if user_additional is None or not self.is_fit_result_cacheable():
+            return super().list(request, *args, **kwargs)
+
+        catalog_version = CatalogVersion.get_version(self.get_catalog_scope())
+        if catalog_version is None:
+            return super().list(request, *args, **kwargs)
+
+        cache = get_catalog_cache()
+        cache_key = self.get_fit_result_cache_key(catalog_version, user_additional)
+        variant_ids = cache.get(cache_key)
+        record_cache_lookup('fit_result', hit=variant_ids is not None)
+        if variant_ids is None:
+            variant_ids = list(self.filter_queryset(self.get_queryset()).values_list('id', flat=True))
+            cache.set(cache_key, variant_ids)
+
+        page_variant_ids = self.paginate_queryset(variant_ids)
+        variants = Variant.objects.select_related('product').in_bulk(page_variant_ids)
+        serializer = self.get_serializer(
+            [variants[variant_id] for variant_id in page_variant_ids if variant_id in variants], many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class CategoriesView(CatalogCacheMixin, ListAPIView):
     serializer_class = CategorySerializer
     pagination_class = None
 
@@ -85,7 +234,7 @@ class CategoriesView(ListAPIView):
             return Category.objects.all()
 
 
-class CategoryProductsView(ListAPIView):
+class CategoryProductsView(CatalogCacheMixin, ListAPIView):
     serializer_class = ProductPreviewSerializer
 
     def get_queryset(self):
@@ -93,63 +242,63 @@ class CategoryProductsView(ListAPIView):
         return category.products.all()
 
 
-class CategoryVariantsView(ListAPIView):
+class CategoryVariantsView(VariantFeedCacheMixin, ListAPIView):
     serializer_class = VariantPreviewSerializer
+    pagination_class = VariantFeedPagination
 
     def get_queryset(self):
         category_variants = Variant.objects.filter(product__categories__id=self.kwargs.get('category_id'),
                                                    product__is_deleted=False)
 
-        # Get the boolean value of a query parameter
-        show_recommendations_qp = self.request.query_params.get('recom')
-        show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
-
-        try:
-            user_additional = self.request.user.additional
-        except UserAdditional.DoesNotExist:
-            user_additional = None
+        user_additional = get_recommendation_user_additional(self.request)
+        size_codes = get_my_size_codes(self.request)
 
-        if show_recommendations and user_additional is not None:  # find the best fit clothes in that category if user additional exists
-            queryset = get_best_fit_variant(user_additional, category_variants)
+        if size_codes is not None:  # only the variants in the sizes of the user
+            queryset = get_my_size_variants(category_variants, size_codes)
+        elif user_additional is not None:  # find the best fit clothes in that category if user additional exists
+            queryset = get_best_fit_variant(user_additional, category_variants,
+                                            category_id=self.kwargs.get('category_id'))
         else:
             queryset = get_middle_variants(category_variants)
 
         return queryset
 
 
-class ShopsView(ListAPIView):
+class ShopsView(CatalogCacheMixin, ListAPIView):
     serializer_class = ShopSerializer
     queryset = Shop.objects.all()
 
 
-class ShopProductsView(ListAPIView):
+class ShopProductsView(CatalogCacheMixin, ListAPIView):
     serializer_class = ProductPreviewSerializer
 
+    def get_catalog_scope(self):
+        return CatalogVersion.shop_scope(self.kwargs.get('shop_id'))
+
     def get_queryset(self):
         return Product.objects.filter(shop_id=self.kwargs.get('shop_id'))
 
 
-class ShopVariantsView(ListAPIView):
+class ShopVariantsView(VariantFeedCacheMixin, ListAPIView):
     serializer_class = VariantPreviewSerializer
+    pagination_class = VariantFeedPagination
 
-    def get_queryset(self):
-        user = self.request.user
-
-        # Get the boolean value of a query parameter
-        show_recommendations_qp = self.request.query_params.get('recom')
-        show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
+    def get_catalog_scope(self):
+        return CatalogVersion.shop_scope(self.kwargs.get('shop_id'))
 
-        try:
-            user_additional = user.additional
-        except UserAdditional.DoesNotExist:
-            user_additional = None
+    def get_queryset(self):
+        user_additional = get_recommendation_user_additional(self.request)
+        size_codes = get_my_size_codes(self.request)
 
         # Variants in random order
         queryset = Variant.objects.filter(product__shop_id=self.kwargs.get('shop_id'))
 
-        if show_recommendations and user_additional is not None:  # find the best fit clothes if user additional exists
-            queryset = queryset.filter(product__categories__gender=user_additional.gender_interested)
-            queryset = get_best_fit_variant(user_additional, queryset)
+        if size_codes is not None:  # only the variants in the sizes of the user
+            queryset = get_my_size_variants(queryset, size_codes)
+        elif user_additional is not None:  # find the best fit clothes if user additional exists
+            queryset = filter_category_gender(queryset, user_additional.gender_interested)
+            queryset = get_best_fit_variant(user_additional, queryset, shop_id=self.kwargs.get('shop_id'),
+                                            gender=user_additional.gender_interested)
         else:
             queryset = get_middle_variants(queryset)
 
@@ -157,21 +306,20 @@ class ShopVariantsView(ListAPIView):
 
 
 
-class VariantsView(ListAPIView):
+class VariantsView(VariantFeedCacheMixin, ListAPIView):
     serializer_class = VariantPreviewSerializer
+    pagination_class = VariantFeedPagination
 
     def filter_gender(self, queryset):
         gender = self.request.query_params.get('gender')
         if gender is not None:
-            queryset = queryset.filter(product__categories__gender=gender)
+            queryset = filter_category_gender(queryset, gender)
         return queryset
 
     def filter_discount(self, queryset):
         discount = self.request.query_params.get('discount')
         if discount is not None:
-            queryset = queryset.filter(product__is_deleted=False).annotate(
-                discount=(F('original_price') - F('final_price')) / F('original_price') * 100).filter(
-                discount__gte=discount).distinct()
+            queryset = queryset.filter(product__is_deleted=False, discount_rate__gte=discount)
         else:
             queryset = queryset.filter(product__is_deleted=False)
         return queryset
@@ -179,59 +327,63 @@ class VariantsView(ListAPIView):
     def get_queryset(self):
         variants_queryset = self.filter_discount(self.filter_gender(Variant.objects.all()))
 
-        # Get the boolean value of a query parameter
-        show_recommendations_qp = self.request.query_params.get('recom')
-        show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
+        user_additional = get_recommendation_user_additional(self.request)
+        size_codes = get_my_size_codes(self.request)
 
-        try:
-            user_additional = self.request.user.additional
-        except UserAdditional.DoesNotExist:
-            user_additional = None
-
-        if show_recommendations and user_additional is not None:  # find the best fit clothes in that category if user additional exists
-            queryset = get_best_fit_variant(user_additional, variants_queryset)
+        if size_codes is not None:  # only the variants in the sizes of the user
+            queryset = get_my_size_variants(variants_queryset, size_codes)
+        elif user_additional is not None:  # find the best fit clothes in that category if user additional exists
+            queryset = get_best_fit_variant(user_additional, variants_queryset,
+                                            gender=self.request.query_params.get('gender'),
+                                            min_discount_rate=self.request.query_params.get('discount'))
         else:
             queryset = get_middle_variants(variants_queryset)
 
         return queryset
 
 
-class ExploreVariantsView(ListAPIView):
+class ExploreVariantsView(VariantFeedCacheMixin, ListAPIView):
     serializer_class = VariantPreviewSerializer
+    pagination_class = ExploreVariantsPagination
 
-    def get_queryset(self):
-        user = self.request.user
+    def is_response_cacheable(self):
+        # Only the seeded shuffle is repeatable
+        return SeededShufflePagination.seed_query_param in self.request.query_params and super().is_response_cacheable()
 
-        # Get the boolean value of a query parameter
-        show_recommendations_qp = self.request.query_params.get('recom')
-        show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
+    def is_fit_result_cacheable(self):
+        # Without a seed the order is random on every request
+        return False
 
-        try:
-            user_additional = user.additional
-        except UserAdditional.DoesNotExist:
-            user_additional = None
+    def get_queryset(self):
+        user_additional = get_recommendation_user_additional(self.request)
+        size_codes = get_my_size_codes(self.request)
 
-        # Variants in random order
-        queryset = Variant.objects.all().order_by('?')
+        # Variants in random order, unless the client pages through the seeded shuffle (see ExploreVariantsPagination)
+        if SeededShufflePagination.seed_query_param in self.request.query_params:
+            queryset = Variant.objects.all()
+        else:
+            queryset = Variant.objects.all().order_by('?')
 
-        if show_recommendations and user_additional is not None:  # find the best fit clothes if user additional exists
-            queryset = queryset.filter(product__categories__gender=user_additional.gender_interested)
-            queryset = get_best_fit_variant(user_additional, queryset)
+        if size_codes is not None:  # only the variants in the sizes of the user
+            queryset = get_my_size_variants(queryset, size_codes)
+        elif user_additional is not None:  # find the best fit clothes if user additional exists
+            queryset = filter_category_gender(queryset, user_additional.gender_interested)
+            queryset = get_best_fit_variant(user_additional, queryset, gender=user_additional.gender_interested)
         else:
             queryset = get_middle_variants(queryset)
 
         return queryset
 
 
-class ProductsView(ListAPIView):
+class ProductsView(CatalogCacheMixin, ListAPIView):
     serializer_class = ProductPreviewSerializer
 
     def get_queryset(self):
         discount = self.request.query_params.get('discount')
         if discount is not None:
-            return Product.objects.annotate(
-                discount=(F('variants__original_price') - F('variants__final_price')) / F(
-                    'variants__original_price') * 100).filter(discount__gte=discount).distinct()
+            return Product.objects.filter(
+                Exists(Variant.objects.filter(product=OuterRef('pk'), discount_rate__gte=discount))
+            )
         return Product.objects.all()
 
 
@@ -239,39 +391,84 @@ class ProductDetailView(RetrieveAPIView):
     serializer_class = ProductDetailSerializer
 
     def get_object(self):
-        return Product.objects.with_deleted().get(id=self.kwargs.get('product_id'))
+        return Product.objects.with_deleted().select_related('shop').prefetch_related('variants').get(
+            id=self.kwargs.get('product_id')
+        )
 
+    def retrieve(self, request, *args, **kwargs):
+        # Fetch the saved and tracked variants of the product once, instead of a query per variant
+        product_id = self.kwargs.get('product_id')
+        user = request.user
+        self.saved_variant_ids = set(SavedVariant.objects.filter(
+            user=user, variant__product_id=product_id, is_deleted=False
+        ).values_list('variant_id', flat=True))
+        self.tracked_variant_ids = set(TrackedVariant.objects.filter(
+            user=user, variant__product_id=product_id, is_deleted=False
+        ).values_list('variant_id', flat=True))
+
+        catalog_version = CatalogVersion.get_version(CatalogVersion.GLOBAL_SCOPE)
+        if catalog_version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        # The detail is personalized by the saved and tracked variants, so they are part of the ETag. There is no
+        # Last-Modified, since saving a variant does not change the catalog version.
+        etag = make_etag(
+            'product', product_id, catalog_version.version, catalog_version.token, user.id,
+            sorted(self.saved_variant_ids), sorted(self.tracked_variant_ids), request.accepted_renderer.format
+        )
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
 
-class VariantSearchView(ListAPIView):
-    serializer_class = VariantPreviewSerializer
+        return set_validators(super().retrieve(request, *args, **kwargs), etag)
 
-    def get_queryset(self):
-        query_param = self.request.query_params.get('q')
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['saved_variant_ids'] = getattr(self, 'saved_variant_ids', None)
+        context['tracked_variant_ids'] = getattr(self, 'tracked_variant_ids', None)
+        return context
 
-        queryset = Variant.objects.filter(product__is_deleted=False).filter(
-            Q(product__title__icontains=query_param) |
-            Q(product__shop__name__icontains=query_param) |
-            Q(product__brand__icontains=query_param) |
-            Q(product__description__icontains=query_param)
-        )
 
-        user = self.request.user
+class VariantSearchView(VariantFeedCacheMixin, ListAPIView):
+    serializer_class = VariantPreviewSerializer
+    pagination_class = VariantSearchPagination
+
+    def get_search_query(self):
+        return SearchQuery(self.request.query_params.get('q'), search_type='websearch', config=Product.SEARCH_CONFIG)
 
-        # Get the boolean value of a query parameter
-        show_recommendations_qp = self.request.query_params.get('recom')
-        show_recommendations = show_recommendations_qp is not None and show_recommendations_qp.lower() in ('true', '1')
+    def get_search_rank(self):
+        # Cast to double precision, so the rank in a cursor compares equal to the rank of its variant
+        return Cast(
+            SearchRank(F('product__search_document'), self.get_search_query()) +
+            TrigramSimilarity('product__title', self.request.query_params.get('q')),
+            output_field=FloatField()
+        )
 
-        try:
-            user_additional = user.additional
-        except UserAdditional.DoesNotExist:
-            user_additional = None
+    def get_queryset(self):
+        query_param = self.request.query_params.get('q')
 
-        if show_recommendations and user_additional is not None:  # find the best fit clothes if user additional exists
-            queryset = get_best_fit_variant(user_additional, queryset)
+        # Full-text match on the product search document (title, shop name, brand and description), plus trigram
+        # similarity for misspelled titles and brands
+        queryset = Variant.objects.filter(product__is_deleted=False).filter(
+            Q(product__search_document=self.get_search_query()) |
+            Q(product__title__trigram_similar=query_param) |
+            Q(product__brand__trigram_similar=query_param)
+        ).annotate(rank=self.get_search_rank())
+
+        user_additional = get_recommendation_user_additional(self.request)
+        size_codes = get_my_size_codes(self.request)
+
+        if size_codes is not None:  # only the variants in the sizes of the user
+            queryset = get_my_size_variants(queryset, size_codes)
+        elif user_additional is not None:  # find the best fit clothes if user additional exists
+            # Only the matching products are scored
+            queryset = get_best_fit_variant(user_additional, queryset,
+                                            product_ids=queryset.order_by().values_list('product_id', flat=True).distinct())
         else:
             queryset = get_middle_variants(queryset)
 
-        return queryset
+        # Most relevant results first
+        return queryset.order_by('-rank', '-id')
 
 
 # TODO: refactor this view
@@ -334,6 +531,7 @@ class TrackVariantView(APIView):
 
 class SavedVariantsView(ListAPIView):
     serializer_class = VariantPreviewSerializer
+    pagination_class = VariantFeedPagination
 
     def get_queryset(self):
         return Variant.objects.filter(savedvariant__user_id=self.kwargs.get('user_id'), savedvariant__is_deleted=False)
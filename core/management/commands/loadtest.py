@@ -0,0 +1,190 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from clothing.models import Category, Product, Variant
+from user.models import User
+
+
+# Traffic mix -> scenario weights
+TRAFFIC_MIXES = {
+    'browse': {
+        'explore': 30, 'category_variants': 30, 'search': 15, 'product_detail': 25,
+    },
+    'recommend': {
+        'explore_recom': 20, 'category_variants_recom': 40, 'category_variants': 10, 'product_detail': 30,
+    },
+    'mixed': {
+        'explore': 15, 'explore_recom': 10, 'category_variants': 15, 'category_variants_recom': 15, 'search': 10,
+        'product_detail': 20, 'login': 3, 'save_variant': 7, 'track_variant': 5,
+    },
+}
+
+# Scenario -> name of the requested url
+SCENARIO_URL_NAMES = {
+    'explore': 'explore_variants',
+    'explore_recom': 'explore_variants',
+    'category_variants': 'category_variants',
+    'category_variants_recom': 'category_variants',
+    'search': 'search_variants',
+    'product_detail': 'product_detail',
+    'login': 'login',
+    'save_variant': 'save_variant',
+    'track_variant': 'track_variant',
+}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of sorted values."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(samples, elapsed):
+    """Latency (ms) percentiles, throughput (requests/s) and status codes of (status code, seconds) samples."""
+    latencies = sorted(round(latency * 1000, 2) for _, latency in samples)
+    status_codes = {}
+    for status_code, _ in samples:
+        status_codes[str(status_code)] = status_codes.get(str(status_code), 0) + 1
+
+    return {
+        'requests': len(samples),
+        # Status 0 is a connection error or a timeout
+        'errors': sum(1 for status_code, _ in samples if not 200 <= status_code < 400),
+        'status_codes': status_codes,
+        'throughput': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': latencies[-1] if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Load tests a running server with a traffic mix of the clothing and user endpoints, and reports the ' \
+           'latency percentiles and throughput per scenario as JSON. It reads the ids and users to request from ' \
+           'the database of the server (e.g. a catalog made with generate_catalog).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='URL of the server under test')
+        parser.add_argument('--mix', choices=TRAFFIC_MIXES.keys(), default='mixed', help='Traffic mix')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+        parser.add_argument('--duration', type=float, default=60, help='Test duration in seconds')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds of requests left out of the report')
+        parser.add_argument('--users', type=int, default=100, help='Number of users to send requests as')
+        parser.add_argument('--password', default='synthetic',
+                            help='Password of the users, for the login scenario (generate_catalog default)')
+        parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the request sequence')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        self.load_test_data(options['users'])
+        self.options = options
+        self.base_url = options['base_url'].rstrip('/')
+        self.scenarios, self.weights = zip(*TRAFFIC_MIXES[options['mix']].items())
+        self.samples = {scenario: [] for scenario in self.scenarios}
+        self.samples_lock = threading.Lock()
+
+        started_at = time.monotonic()
+        self.measure_from = started_at + options['warmup']
+        self.deadline = self.measure_from + options['duration']
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            clients = [executor.submit(self.run_client, client_number)
+                       for client_number in range(options['concurrency'])]
+        for client in clients:
+            client.result()
+
+        report = {
+            'base_url': self.base_url,
+            'mix': options['mix'],
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'total': summarize([sample for samples in self.samples.values() for sample in samples],
+                               options['duration']),
+            'scenarios': {
+                scenario: {'url_name': SCENARIO_URL_NAMES[scenario], **summarize(samples, options['duration'])}
+                for scenario, samples in self.samples.items()
+            },
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            total = report['total']
+            self.stdout.write(f'{total["requests"]} requests, {total["throughput"]} req/s, p50 {total["p50"]} ms, '
+                              f'p99 {total["p99"]} ms, {total["errors"]} errors')
+        else:
+            self.stdout.write(output)
+
+    def load_test_data(self, users_count):
+        users = list(User.objects.filter(is_verified=True, additional__isnull=False).order_by('id')[:users_count])
+        self.category_ids = list(Category.objects.filter(products__isnull=False).distinct().values_list('id', flat=True))
+        self.product_ids = list(Product.objects.order_by('?').values_list('id', flat=True)[:1000])
+        self.variant_ids = list(Variant.objects.order_by('?').values_list('id', flat=True)[:1000])
+        if not users or not self.category_ids or not self.product_ids:
+            raise CommandError('The load test needs users with measurements and a catalog, see generate_catalog.')
+
+        self.users = [(user.id, user.username, user.tokens()['access']) for user in users]
+        self.search_terms = sorted({word for title in Product.objects.values_list('title', flat=True)[:1000]
+                                    for word in title.split()})
+
+    def get_request(self, scenario, rng, user):
+        """Returns the method, path, query parameters and JSON body of a request of the scenario."""
+        user_id, username, _ = user
+        url_name = SCENARIO_URL_NAMES[scenario]
+        query = {}
+        if scenario.endswith('_recom'):
+            query['recom'] = 'true'
+
+        if url_name == 'explore_variants':
+            query['seed'] = rng.randrange(100)
+            return 'GET', reverse(url_name), query, None
+        if url_name == 'category_variants':
+            query['page'] = rng.choice((1, 1, 1, 2, 3))
+            return 'GET', reverse(url_name, kwargs={'category_id': rng.choice(self.category_ids)}), query, None
+        if url_name == 'search_variants':
+            return 'GET', reverse(url_name), {'q': rng.choice(self.search_terms)}, None
+        if url_name == 'product_detail':
+            return 'GET', reverse(url_name, kwargs={'product_id': rng.choice(self.product_ids)}), None, None
+        if url_name == 'login':
+            return 'POST', reverse(url_name), None, {'username': username, 'password': self.options['password']}
+        # Save and track
+        return 'POST', reverse(url_name), None, {'user': user_id, 'variant': rng.choice(self.variant_ids)}
+
+    def run_client(self, client_number):
+        # Every client has its own request sequence, so runs with the same seed send the same requests
+        rng = random.Random(self.options['seed'] * 1000 + client_number)
+        user = self.users[client_number % len(self.users)]
+        session = requests.Session()
+        session.headers['Authorization'] = f'Bearer {user[2]}'
+
+        while time.monotonic() < self.deadline:
+            scenario = rng.choices(self.scenarios, self.weights)[0]
+            method, path, query, body = self.get_request(scenario, rng, user)
+
+            started_at = time.monotonic()
+            try:
+                response = session.request(method, self.base_url + path, params=query, json=body,
+                                           timeout=self.options['timeout'])
+                status_code = response.status_code
+            except requests.RequestException:
+                status_code = 0
+            finished_at = time.monotonic()
+
+            if self.measure_from <= started_at and finished_at <= self.deadline:
+                with self.samples_lock:
+                    self.samples[scenario].append((status_code, finished_at - started_at))
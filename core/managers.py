@@ -1,13 +1,25 @@
 from django.db import models
 from django.utils import timezone
 
+from core.signals import post_soft_delete, post_restore
+
 
 class SoftDeleteQuerySet(models.QuerySet):
+    def _update_with_signal(self, signal, **kwargs):
+        # The affected primary keys are only needed (and fetched) when there are receivers
+        if not signal.has_listeners(self.model):
+            return self.update(**kwargs)
+
+        pks = list(self.values_list('pk', flat=True))
+        count = self.model._base_manager.filter(pk__in=pks).update(**kwargs)
+        signal.send(sender=self.model, pks=pks)
+        return count
+
     def delete(self):
-        return self.update(is_deleted=True, deleted_at=timezone.now())
+        return self._update_with_signal(post_soft_delete, is_deleted=True, deleted_at=timezone.now())
 
     def restore(self):
-        return self.update(is_deleted=False, deleted_at=None)
+        return self._update_with_signal(post_restore, is_deleted=False, deleted_at=None)
 
     def hard_delete(self):
         return super().delete()
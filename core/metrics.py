@@ -0,0 +1,56 @@
+"""
+Prometheus metrics of the API and the integrator.
+
+With the PROMETHEUS_MULTIPROC_DIR environment variable set, every process (the gunicorn workers and the
+integrator runs) writes its samples to files in that directory, and the /metrics view aggregates them.
+"""
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, multiprocess
+
+
+REQUEST_DURATION = Histogram(
+    'chicpic_http_request_duration_seconds', 'Request latency, per url name',
+    ['method', 'url_name'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    'chicpic_http_requests_total', 'Responses, per url name and status code',
+    ['method', 'url_name', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'chicpic_http_request_db_queries', 'Database queries per request, per url name',
+    ['url_name'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+CACHE_LOOKUPS = Counter(
+    'chicpic_cache_lookups_total', 'Cache lookups, per cached result and outcome (hit or miss)',
+    ['cache', 'result'],
+)
+
+INTEGRATOR_OBJECTS = Counter(
+    'chicpic_integrator_objects_total', 'Objects created or updated by the integrator',
+    ['shop', 'model', 'action'],
+)
+INTEGRATOR_RUNS = Counter(
+    'chicpic_integrator_runs_total', 'Integrator runs, per result (success or error)',
+    ['shop', 'result'],
+)
+INTEGRATOR_DURATION = Histogram(
+    'chicpic_integrator_duration_seconds', 'Duration of the integrator runs',
+    ['shop'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600),
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
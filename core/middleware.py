@@ -0,0 +1,156 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import REQUEST_DURATION, REQUESTS, REQUEST_DB_QUERIES
+
+
+logger = logging.getLogger('chicpic.profiling')
+
+
+class RequestProfile:
+    """
+    Timings of a request: the database queries (as a connection execute wrapper), the view without the queries it
+    runs, which for the API views is mostly serialization, and the rendering of the response.
+    """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = None
+        self.render_time = None
+        self.total_time = None
+        self._view_started_at = None
+        self._view_db_time = None
+        self._render_started_at = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started_at
+
+    def view_started(self):
+        self._view_started_at = time.perf_counter()
+        self._view_db_time = self.db_time
+
+    def render_started(self):
+        self._render_started_at = time.perf_counter()
+        if self._view_started_at is not None:
+            view_time = self._render_started_at - self._view_started_at
+            self.serializer_time = view_time - (self.db_time - self._view_db_time)
+
+    def render_finished(self, response=None):
+        self.render_time = time.perf_counter() - self._render_started_at
+
+    def get_timings(self):
+        """Name -> milliseconds of the measured timings."""
+        timings = {
+            'db': self.db_time,
+            'serializer': self.serializer_time,
+            'render': self.render_time,
+            'total': self.total_time,
+        }
+        return {name: round(value * 1000, 2) for name, value in timings.items() if value is not None}
+
+    def server_timing(self):
+        metrics = []
+        for name, duration in self.get_timings().items():
+            if name == 'db':
+                metrics.append(f'db;dur={duration};desc="{self.db_queries} queries"')
+            else:
+                metrics.append(f'{name};dur={duration}')
+        return ', '.join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Profiles a sample of the requests (SERVER_TIMING_SAMPLE_RATE) and reports the timings in the Server-Timing
+    header of the response, and as a JSON log line on the chicpic.profiling logger when SERVER_TIMING_LOG is on.
+    Requests out of the sample are not instrumented at all.
+
+    It should be one of the first middlewares, so the total covers the others.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        request.request_profile = profile
+        started_at = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        profile.total_time = time.perf_counter() - started_at
+
+        response['Server-Timing'] = profile.server_timing()
+        if settings.SERVER_TIMING_LOG:
+            resolver_match = request.resolver_match
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'url_name': resolver_match.url_name if resolver_match is not None else None,
+                'status': response.status_code,
+                'db_queries': profile.db_queries,
+                **profile.get_timings(),
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, 'request_profile', None)
+        if profile is not None:
+            profile.view_started()
+
+    def process_template_response(self, request, response):
+        # Called before the response (e.g. a DRF Response) is rendered
+        profile = getattr(request, 'request_profile', None)
+        if profile is not None:
+            profile.render_started()
+            response.add_post_render_callback(profile.render_finished)
+        return response
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class PrometheusMetricsMiddleware:
+    """Records the latency, the status code and the database query count of every request, per url name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_counter = QueryCounter()
+        started_at = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started_at
+
+        # Requests that do not match a url are grouped, so unknown paths don't add label values
+        resolver_match = request.resolver_match
+        url_name = (resolver_match.url_name or resolver_match.view_name) if resolver_match is not None else 'unmatched'
+        REQUEST_DURATION.labels(method=request.method, url_name=url_name).observe(duration)
+        REQUESTS.labels(method=request.method, url_name=url_name, status=response.status_code).inc()
+        REQUEST_DB_QUERIES.labels(url_name=url_name).observe(query_counter.count)
+        return response
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 
 from core.managers import SoftDeleteManager
+from core.signals import post_soft_delete, post_restore
 
 
 class SoftDeleteModel(models.Model):
@@ -17,6 +18,7 @@ class SoftDeleteModel(models.Model):
         self.is_deleted = True
         self.deleted_at = timezone.now()
         self.save()
+        post_soft_delete.send(sender=self.__class__, pks=[self.pk])
 
     def hard_delete(self):
         super().delete()
@@ -25,3 +27,4 @@ class SoftDeleteModel(models.Model):
         self.is_deleted = False
         self.deleted_at = None
         self.save()
+        post_restore.send(sender=self.__class__, pks=[self.pk])
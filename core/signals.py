@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent after records are soft-deleted or restored, with the model class as sender and the affected primary keys
+# as `pks`. Soft deletes are plain updates, so Django's pre_delete/post_delete signals are not sent for them.
+post_soft_delete = Signal()
+post_restore = Signal()
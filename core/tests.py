@@ -1,3 +1,87 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.management.commands.loadtest import percentile, summarize
+
+
+class LoadTestReportTest(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        summary = summarize([(200, 0.010), (200, 0.020), (500, 0.030), (0, 0.040)], elapsed=2)
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['status_codes'], {'200': 2, '500': 1, '0': 1})
+        self.assertEqual(summary['throughput'], 2)
+        self.assertEqual(summary['p50'], 20)
+        self.assertEqual(summary['max'], 40)
+
+
+class ServerTimingMiddlewareTest(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='user@chicpic.app', username='user_user', password='test1234')
+        self.client.force_authenticate(user=user)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_server_timing_header(self):
+        with self.assertLogs('chicpic.profiling', level='INFO') as logs, self.settings(SERVER_TIMING_LOG=True):
+            response = self.client.get(reverse('shops'))
+
+        metrics = {metric.split(';')[0]: metric for metric in response['Server-Timing'].split(', ')}
+        self.assertCountEqual(metrics, ['db', 'serializer', 'render', 'total'])
+        self.assertRegex(metrics['db'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+        log = json.loads(logs.records[0].getMessage())
+        self.assertEqual(log['url_name'], 'shops')
+        self.assertEqual(log['status'], 200)
+        self.assertGreater(log['db_queries'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('shops'))
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(METRICS_TOKEN='metrics-token')
+class MetricsTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@chicpic.app', username='user_user',
+                                                         password='test1234')
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_metrics(self):
+        self.client.get(reverse('shops'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer metrics-token')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        self.assertIn('chicpic_http_requests_total{method="GET",status="200",url_name="shops"}', content)
+        self.assertIn('chicpic_http_request_duration_seconds_bucket{le="0.01",method="GET",url_name="shops"}', content)
+        self.assertIn('chicpic_http_request_db_queries_count{url_name="shops"}', content)
+
+    def test_metrics_access(self):
+        # Users and wrong tokens
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong-token')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(METRICS_TOKEN=''):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
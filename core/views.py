@@ -1,3 +1,23 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from core.metrics import get_registry
+
+
+def has_metrics_access(request):
+    """Staff users, and the clients with the METRICS_TOKEN bearer token (e.g. Prometheus)."""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics(request):
+    """Prometheus metrics of all the workers. Not exposed through nginx, Prometheus scrapes the api service."""
+    if not has_metrics_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
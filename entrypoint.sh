@@ -8,6 +8,12 @@ done
 
 echo 'Postgres started'
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    # Samples of the processes of the previous run are stale
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo 'Running migrations...'
 python manage.py migrate
 
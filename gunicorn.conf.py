@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Drop the live samples of exited workers from the aggregated metrics
+    multiprocess.mark_process_dead(worker.pid)
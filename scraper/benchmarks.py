@@ -0,0 +1,163 @@
+"""
+Benchmarks of the scraper pipeline.
+
+    python -m scraper.benchmarks parse --products 20000 --workers 1 2 4 8
+    python -m scraper.benchmarks integrate --products 2000
+"""
+import argparse
+import builtins
+import importlib
+import os
+import random
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from scraper import utils
+
+
+def generate_scraped_products(count: int, seed: int = 0) -> list:
+    """Kit and Ace shaped products.json products, with a long HTML description like the real ones."""
+    rng = random.Random(seed)
+    # Product type -> size guide, of the Kit and Ace fixtures
+    product_types = {'Shirts & Tops': 'Tops', 'Hoodies': 'Tops', 'Sweater': 'Tops', 'Pants': 'Bottoms',
+                     'Shorts': 'Bottoms'}
+    colors = ['Black', 'Navy/Marine', 'Cove Grey', 'Black Walnut', 'Dusk/Daybreak', 'Black/White Stripe']
+    sizes = ['XS', 'S', 'M', 'L', 'XL']
+    description = ''.join(f'<p>Paragraph {index} of the <strong>product</strong> description, with a '
+                          f'<a href="/pages/care">care guide</a> and <em>fabric</em> details.</p>'
+                          for index in range(20))
+
+    products = []
+    for product_id in range(1, count + 1):
+        gender = rng.choice(['Women', 'Men'])
+        product_type = rng.choice(list(product_types))
+        image = {'src': f'https://cdn.shopify.com/{product_id}.jpg', 'width': 1200, 'height': 1500}
+        variants = [
+            {'id': product_id * 100 + index, 'product_id': product_id, 'available': rng.random() < 0.8,
+             'price': '98.00', 'compare_at_price': '128.00', 'option1': color, 'option2': size, 'option3': None,
+             'featured_image': image}
+            for index, (color, size) in enumerate((color, size) for color in rng.sample(colors, 2) for size in sizes)
+        ]
+        products.append({
+            'id': product_id,
+            'title': f'{product_type} {product_id}',
+            'handle': f'product-{product_id}',
+            'body_html': description,
+            'vendor': 'Kit and Ace',
+            'product_type': product_type,
+            'tags': [gender, f'SizeGuide::{gender}-{product_types[product_type]}', 'New Arrivals', 'Machine Washable'],
+            'updated_at': '2024-01-01T00:00:00-05:00',
+            'options': [{'name': 'Color', 'position': 1, 'values': colors},
+                        {'name': 'Size', 'position': 2, 'values': sizes}],
+            'variants': variants,
+            'images': [image],
+        })
+    return products
+
+
+def benchmark_parse(parser, scraped_products: list, workers_counts: list, repeat: int):
+    """Prints the best parse time of every worker count, and its speedup over the sequential parse."""
+    baseline = None
+    print(f'{len(scraped_products)} products, {os.cpu_count()} CPUs, chunks of {parser.PARSE_CHUNK_SIZE}')
+    print(f'{"workers":>8} {"seconds":>9} {"products/s":>11} {"speedup":>8}')
+
+    for workers in workers_counts:
+        durations = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            parsed_count = sum(1 for _ in parser.parse_products(scraped_products, workers=workers))
+            durations.append(time.perf_counter() - started_at)
+
+        duration = min(durations)
+        if baseline is None:
+            baseline = duration
+        print(f'{workers:>8} {duration:>9.3f} {len(scraped_products) / duration:>11.0f} '
+              f'{baseline / duration:>7.2f}x  ({parsed_count} parsed)')
+
+
+@contextmanager
+def count_file_opens():
+    """Counts the files opened in the block, e.g. fixture loads."""
+    with mock.patch.object(builtins, 'open', wraps=builtins.open) as counted_open:
+        yield counted_open
+
+
+def benchmark_integrate(converter, parsed_products: list, repeat: int):
+    """
+    Prints the time and the files opened by the conversions of the integrator (products, categories, variants,
+    sizings and size codes) of the parsed products. The categories are read from the configured database, and the
+    ones missing there are counted.
+    """
+    from scraper.converters import Category
+    from scraper.registry import fixtures
+
+    variants_count = sum(len(product['variants']) for product in parsed_products)
+    print(f'{len(parsed_products)} products, {variants_count} variants')
+    print(f'{"run":>4} {"seconds":>9} {"products/s":>11} {"files opened":>13} {"missing categories":>19}')
+
+    for run in range(1, repeat + 1):
+        missing_categories = 0
+        shop = converter.shop
+        with count_file_opens() as counted_open:
+            started_at = time.perf_counter()
+            for product in parsed_products:
+                product_obj = converter.convert_product(product=product, shop=shop)
+                try:
+                    converter.convert_categories(product)
+                except Category.DoesNotExist:
+                    missing_categories += 1
+                for variant in product['variants']:
+                    variant_obj = converter.convert_variant(variant=variant, product=product_obj)
+                    converter.convert_sizings(product=product, variant=variant_obj)
+                    converter.convert_size_code(product=product, variant=variant_obj)
+            duration = time.perf_counter() - started_at
+
+        print(f'{run:>4} {duration:>9.3f} {len(parsed_products) / duration:>11.0f} {counted_open.call_count:>13} '
+              f'{missing_categories:>19}')
+    print(f'Fixture files loaded: {dict(fixtures.file_loads)}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = arg_parser.add_subparsers(dest='benchmark', required=True)
+
+    parse_arg_parser = subparsers.add_parser('parse',
+                                             help='Parse time of ShopifyParser.parse_products per worker count')
+    parse_arg_parser.add_argument('--parser', default='KitAndAceParser', help='Parser class of scraper.parsers')
+    parse_arg_parser.add_argument('--scraped-file',
+                                  help='Scraped products (JSON Lines) to parse, instead of generated products')
+    parse_arg_parser.add_argument('--products', type=int, default=10000, help='Number of generated products')
+    parse_arg_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                                  help='Worker counts to compare, the first one is the baseline')
+    parse_arg_parser.add_argument('--repeat', type=int, default=3, help='Runs per worker count, the best is reported')
+
+    integrate_arg_parser = subparsers.add_parser(
+        'integrate', help='Time and file I/O of the integrator conversions of parsed products')
+    integrate_arg_parser.add_argument('--parser', default='KitAndAceParser', help='Parser class of scraper.parsers')
+    integrate_arg_parser.add_argument('--converter', default='KitAndAceDataConverter',
+                                      help='Converter class of scraper.converters')
+    integrate_arg_parser.add_argument('--parsed-file',
+                                      help='Parsed products (JSON Lines) to convert, instead of generated products')
+    integrate_arg_parser.add_argument('--products', type=int, default=2000, help='Number of generated products')
+    integrate_arg_parser.add_argument('--repeat', type=int, default=2, help='Runs of the conversions')
+
+    args = arg_parser.parse_args()
+    parser = getattr(importlib.import_module('scraper.parsers'), args.parser)()
+    if args.benchmark == 'parse':
+        if args.scraped_file:
+            scraped_products = list(utils.read_jsonl_file(args.scraped_file))
+        else:
+            scraped_products = generate_scraped_products(args.products)
+        benchmark_parse(parser, scraped_products, args.workers, args.repeat)
+    elif args.benchmark == 'integrate':
+        converter = getattr(importlib.import_module('scraper.converters'), args.converter)()
+        if args.parsed_file:
+            parsed_products = list(utils.read_jsonl_file(args.parsed_file))
+        else:
+            parsed_products = list(parser.parse_products(generate_scraped_products(args.products)))
+        benchmark_integrate(converter, parsed_products, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
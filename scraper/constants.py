@@ -8,11 +8,15 @@ LOGS_FILE_PATH = os.path.join(LOGS_DIR, '{module_name}.log')
 
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 SHOP_CATEGORIES_FILE_NAME = 'categories.json'
-SCRAPED_PRODUCTS_FILE_NAME = 'scraped_products.json'
-PARSED_PRODUCTS_FILE_NAME = 'parsed_product.json'
+SCRAPED_PRODUCTS_FILE_NAME = 'scraped_products.jsonl'
+PARSED_PRODUCTS_FILE_NAME = 'parsed_product.jsonl'
+SCRAPE_STATE_FILE_NAME = 'scrape_state.json'
+PENDING_SCRAPE_STATE_FILE_NAME = 'scrape_state.pending.json'
 SCRAPED_PRODUCTS_FILE_PATH = os.path.join(DATA_DIR, '{shop_name}', SCRAPED_PRODUCTS_FILE_NAME)
 PARSED_PRODUCTS_FILE_PATH = os.path.join(DATA_DIR, '{shop_name}', PARSED_PRODUCTS_FILE_NAME)
 SHOP_CATEGORIES_FILE_PATH = os.path.join(DATA_DIR, '{shop_name}', SHOP_CATEGORIES_FILE_NAME)
+SCRAPE_STATE_FILE_PATH = os.path.join(DATA_DIR, '{shop_name}', SCRAPE_STATE_FILE_NAME)
+PENDING_SCRAPE_STATE_FILE_PATH = os.path.join(DATA_DIR, '{shop_name}', PENDING_SCRAPE_STATE_FILE_NAME)
 
 FIXTURES_DIR = os.path.join(BASE_DIR, 'fixtures')
 CATEGORIES_CONVERTER_DIR = os.path.join(FIXTURES_DIR, 'categories')
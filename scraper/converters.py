@@ -1,11 +1,10 @@
-import json
 import logging
 import os
-import csv
 import django
 from abc import ABC
 
 from scraper import utils, constants
+from scraper.registry import fixtures
 
 # Set up the Django settings module
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chicpic.settings")
@@ -13,6 +12,7 @@ django.setup()
 
 from user.models import GenderChoices
 from clothing.models import Category, Shop, Attribute, Product, ProductAttribute, Variant, Sizing
+from clothing.sizes import get_size_code
 
 
 class DataConverter(ABC):
@@ -73,6 +73,7 @@ class DataConverter(ABC):
             link=variant['link'],
             original_price=variant['original_price'],
             final_price=variant['final_price'],
+            discount_rate=Variant.calculate_discount_rate(variant['original_price'], variant['final_price']),
             is_available=variant['available'],
             option1=variant['option1'],
             option2=variant['option2'],
@@ -93,11 +94,12 @@ class DataConverter(ABC):
         return categories
 
     @utils.log_function_call
-    def get_size_guide(self, sizing_type: str) -> tuple:
-        file_path = constants.SHOP_SIZE_GUIDES_FILE_PATH.format(shop_name=self.shop_name, size_guide_type=sizing_type)
-        with open(file_path, 'r') as csv_file:
-            reader = csv.DictReader(csv_file)
-            return tuple(reader)
+    def get_size_guide(self, sizing_type: str) -> dict:
+        # Size -> row, loaded once per run (see FixtureRegistry)
+        return fixtures.get_size_guide(self.shop_name, sizing_type)
+
+    def get_size_guide_row(self, sizing_type: str, size: str) -> dict | None:
+        return fixtures.get_size_guide_row(self.shop_name, sizing_type, size)
 
     def _product_option_position(self, product: dict, option_name: str):
         position = next((opt['position'] for opt in product['attributes'] if opt['name'] == option_name), None)
@@ -112,8 +114,7 @@ class DataConverter(ABC):
         if product['size_guide'] is None:
             return []
 
-        size_guide_reader = self.get_size_guide(product['size_guide'])
-        selected_row = next((row for row in size_guide_reader if row['Size'] == variant.size), None)
+        selected_row = self.get_size_guide_row(product['size_guide'], variant.size)
 
         if selected_row is None:  # Variant size not found in size guide
             return sizings
@@ -139,17 +140,26 @@ class DataConverter(ABC):
         return sizings
 
     @utils.log_function_call
-    def convert_category(self, category_title: str, category_gender: str) -> Category:
-        # Load shop categories file
-        with open(constants.SHOP_CATEGORIES_CONVERTER_FILE_PATH.format(shop_name=self.shop_name), 'r') as f:
-            shop_categories_mapping = json.loads(f.read())
+    def convert_size_code(self, product: dict, variant: Variant) -> str | None:
+        if product['size_guide'] is None or variant.size is None:
+            return None
+
+        # Shoe size guides map the shop sizes (e.g. EU) to US sizes
+        try:
+            selected_row = self.get_size_guide_row(product['size_guide'], variant.size)
+        except FileNotFoundError:
+            selected_row = None
+        us_shoe_size = selected_row.get('Shoe Size') if selected_row is not None else None
 
+        size_code = get_size_code(product['size_guide'], variant.size, us_shoe_size)
+        if size_code is None:
+            self.logger.warning(f'Size code not found. size guide: {product["size_guide"]}, size: {variant.size}.')
+        return size_code
+
+    @utils.log_function_call
+    def convert_category(self, category_title: str, category_gender: str) -> Category:
         # Find proper chicpic category similar according to shop categories
-        selected_category = None
-        for category in shop_categories_mapping:
-            if category['gender'] == category_gender and category['title'] == category_title:
-                selected_category = category
-                break
+        selected_category = fixtures.get_category(self.shop_name, category_title, category_gender)
 
         if selected_category is None:
             self.logger.error(f'Proper category not found. title: {category_title}, gender: {category_gender}.')
@@ -171,10 +181,7 @@ class KitAndAceDataConverter(DataConverter):
         super().__init__(shop=constants.Shops.KIT_AND_ACE.value)
 
     def __convert_color(self, color_name: str) -> str:
-        file_path = constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop_name)
-        with open(file_path, 'r') as f:
-            colors_data = json.loads(f.read())
-        return colors_data.get(color_name)
+        return fixtures.get_colors(self.shop_name).get(color_name)
 
     def convert_variant(self, variant: dict, product: Product) -> Variant:
         return Variant(
@@ -184,6 +191,7 @@ class KitAndAceDataConverter(DataConverter):
             link=variant['link'],
             original_price=variant['original_price'],
             final_price=variant['final_price'],
+            discount_rate=Variant.calculate_discount_rate(variant['original_price'], variant['final_price']),
             is_available=variant['available'],
             option1=variant['option1'],
             option2=variant['option2'],
@@ -201,8 +209,7 @@ class KitAndAceDataConverter(DataConverter):
             except KeyError:
                 return super().convert_sizings(product, variant)
 
-            size_guide_reader = self.get_size_guide(product['size_guide'])
-            selected_row = next((row for row in size_guide_reader if row['Size'] == variant.size), None)
+            selected_row = self.get_size_guide_row(product['size_guide'], variant.size)
 
             if selected_row is None:  # Variant size not found in size guide
                 return []
@@ -216,8 +223,7 @@ class KitAndAceDataConverter(DataConverter):
             variant_size = variant.size
 
             if 'T' in variant_size:
-                size_guide_reader = self.get_size_guide(product['size_guide'])
-                selected_row = next((row for row in size_guide_reader if row['Size'] == variant_size[:-1]), None)
+                selected_row = self.get_size_guide_row(product['size_guide'], variant_size[:-1])
 
                 if selected_row is None:  # Variant size not found in size guide
                     return []
@@ -2,11 +2,16 @@ import importlib
 import json
 import logging
 import os
+import time
 
 from django.db import transaction, IntegrityError, DataError
 from scraper import constants, scrapers, parsers, converters
 
 from scraper.converters import Product, ProductAttribute, Variant, Sizing
+from clothing.fitting import refresh_best_fit_variants
+from clothing.models import CatalogVersion
+from clothing.signals import suspend_catalog_version_bumps
+from core.metrics import INTEGRATOR_OBJECTS, INTEGRATOR_RUNS, INTEGRATOR_DURATION
 
 
 class DataIntegrator:
@@ -15,7 +20,6 @@ class DataIntegrator:
         self._scraper = scraper
         self._parser = parser
         self._converter = converter
-        self._parsed_product = []
         self.__config_logger()
 
     def __config_logger(self):
@@ -32,26 +36,29 @@ class DataIntegrator:
         self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
 
-    def load_parsed_products(self):
-        self._parsed_product = self._parser.read_parsed_file_data()
-
-    def scrape_save(self):
-        scraped_products = self._scraper.fetch_products()
+    def scrape_save(self, incremental=False):
+        # The products are written as their pages arrive, and the scrape state is complete once they are all written
+        scraped_products = self._scraper.fetch_products(incremental=incremental)
         self._scraper.save_products(scraped_products)
+        self._scraper.save_scrape_state()
 
-    def parse_save(self):
+    def parse_save(self, workers=None):
+        # The products are read, parsed and saved one at a time
         scraped_products = self._scraper.read_scraped_file_data()
-        self._parsed_product = self._parser.parse_products(scraped_products)
-        self._parser.save_products(self._parsed_product)
+        self._parser.save_products(self._parser.parse_products(scraped_products, workers=workers))
 
     def integrate(self):
         created_objects_count = {'Products': 0, 'Product Categories': 0, 'Variants': 0, 'Product Attributes': 0,
                                  'Sizings': 0}
         updated_objects_count = {'Products': 0, 'Product Categories': 0, 'Variants': 0, 'Product Attributes': 0,
                                  'Sizings': 0}
+        unchanged_products_count = 0
+        started_at = time.perf_counter()
+        shop_name = self._converter.shop_name
 
         try:
-            with transaction.atomic():
+            # The catalog version is bumped once, after the shop products are integrated
+            with transaction.atomic(), suspend_catalog_version_bumps():
                 shop_obj = self._converter.shop
                 shop_obj.save()
 
@@ -59,10 +66,16 @@ class DataIntegrator:
                 Product.objects.filter(
                     shop_id=shop_obj.id
                 ).exclude(
-                    original_id__in=[p['product_id'] for p in self._parsed_product]
-                ).delet()
+                    original_id__in=[p['product_id'] for p in self._parser.read_parsed_file_data()]
+                ).delete()
+
+                integrated_product_ids = []
+                for product in self._parser.read_parsed_file_data():
+                    # Products not modified since the last integration are kept as they are
+                    if product.get('unchanged'):
+                        unchanged_products_count += 1
+                        continue
 
-                for product in self._parsed_product:
                     product_tmp_obj = self._converter.convert_product(product=product, shop=shop_obj)
 
                     # Check if the product already exists
@@ -85,6 +98,7 @@ class DataIntegrator:
                         created_objects_count['Products'] += 1
 
                     product_obj.save()
+                    integrated_product_ids.append(product_obj.id)
 
                     # Handle categories
                     categories = self._converter.convert_categories(product)
@@ -122,6 +136,7 @@ class DataIntegrator:
                             variant_obj.link = variant_tmp_obj.link
                             variant_obj.original_price = variant_tmp_obj.original_price
                             variant_obj.final_price = variant_tmp_obj.final_price
+                            variant_obj.discount_rate = variant_tmp_obj.discount_rate
                             variant_obj.is_available = variant_tmp_obj.is_available
                             variant_obj.color_hex = variant_tmp_obj.color_hex
                             variant_obj.size = variant_tmp_obj.size
@@ -133,10 +148,14 @@ class DataIntegrator:
                             variant_obj = variant_tmp_obj
                             created_objects_count['Variants'] += 1
 
+                        # Keep the variant measurement columns in sync with its sizings
+                        sizing_tmp_objects = self._converter.convert_sizings(product=product, variant=variant_obj)
+                        variant_obj.set_measurements(sizing_tmp_objects)
+                        variant_obj.size_code = self._converter.convert_size_code(product=product, variant=variant_obj)
+
                         variant_obj.save()
 
                         # Handle sizings
-                        sizing_tmp_objects = self._converter.convert_sizings(product=product, variant=variant_obj)
                         for sizing_tmp_obj in sizing_tmp_objects:
                             # Check if the sizing already exists
                             try:
@@ -151,13 +170,43 @@ class DataIntegrator:
 
                             sizing_obj.save()
 
+                    # Select the representative variant shown in the feeds and summarize the variants
+                    product_obj.update_middle_variant()
+                    product_obj.update_summary()
+                    product_obj.save(update_fields=['middle_variant', 'preview_image', 'has_discount',
+                                                    'min_final_price', 'max_final_price', 'variants_count'])
+
+                # Refresh the full-text search documents of the shop products
+                Product.objects.with_deleted().filter(shop_id=shop_obj.id).update(
+                    search_document=Product.search_document_vector(shop_obj.name)
+                )
+
+                # Refresh the precomputed best-fit variants of the size profiles for the integrated products
+                refresh_best_fit_variants(product_ids=integrated_product_ids)
+
+                # Invalidate the cached catalog responses
+                CatalogVersion.bump(shop_id=shop_obj.id)
+
                 print("Created Objects:", created_objects_count)
                 print("Updated Objects:", updated_objects_count)
+                print("Unchanged Products:", unchanged_products_count)
+
+            # The next incremental scrape only fetches the products changed since this one
+            self._scraper.commit_scrape_state()
+
+            for action, objects_count in (('created', created_objects_count), ('updated', updated_objects_count)):
+                for model_name, count in objects_count.items():
+                    INTEGRATOR_OBJECTS.labels(shop=shop_name, model=model_name, action=action).inc(count)
+            INTEGRATOR_RUNS.labels(shop=shop_name, result='success').inc()
 
         except (IntegrityError, DataError) as error:
             self.logger.exception(error)
+            INTEGRATOR_RUNS.labels(shop=shop_name, result='error').inc()
         except Exception as error:
             self.logger.exception(error)
+            INTEGRATOR_RUNS.labels(shop=shop_name, result='error').inc()
+        finally:
+            INTEGRATOR_DURATION.labels(shop=shop_name).observe(time.perf_counter() - started_at)
 
 
 def get_valid_shop_selection(shops):
@@ -204,8 +253,12 @@ if __name__ == '__main__':
         need_scrape = input('Do you want to scrape? (y/n): ')
 
     if need_scrape == 'y':
+        need_incremental = None
+        while need_incremental not in ['y', 'n']:
+            need_incremental = input('Do you want to fetch the changed products only? (y/n): ')
+
         print(f'Scraping {selected_shop["name"]}...')
-        my_integrator.scrape_save()
+        my_integrator.scrape_save(incremental=need_incremental == 'y')
 
     need_parse = None
     while need_parse not in ['y', 'n']:
@@ -213,9 +266,7 @@ if __name__ == '__main__':
         need_parse = input('Do you want to parse? (y/n): ')
 
     if need_parse == 'y':
-        my_integrator.parse_save()
-    else:
-        my_integrator.load_parsed_products()
+        my_integrator.parse_save(workers=os.cpu_count())
 
     need_integrate = None
     while need_integrate not in ['y', 'n']:
@@ -1,17 +1,22 @@
-import json
 import logging
 import os
 from abc import ABC, abstractmethod
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
 
 import requests
 
 from scraper import utils, constants
+from scraper.registry import fixtures
 
 
 class ShopifyParser(ABC):
     UNACCEPTABLE_PRODUCT_TYPES = None
     UNACCEPTABLE_TAGS = None
+    # Products per chunk of the worker processes of parse_products
+    PARSE_CHUNK_SIZE = 100
 
     def __init__(self, shop: constants.ShopConstant):
         assert self.UNACCEPTABLE_PRODUCT_TYPES is not None, 'UNACCEPTABLE_PRODUCT_TYPES is None'
@@ -22,6 +27,8 @@ class ShopifyParser(ABC):
         self.UNACCEPTABLE_PRODUCT_TYPES = [product_type.lower() for product_type in self.UNACCEPTABLE_PRODUCT_TYPES]
 
         self.shop = shop
+        # Colors added to the shop colors fixture by this parser, and not saved yet (see add_colors)
+        self._new_colors = {}
         self.__config_logger()
 
     def __config_logger(self):
@@ -47,12 +54,13 @@ class ShopifyParser(ABC):
         file_handler.setLevel(level=logging.INFO)
         self.logger.addHandler(file_handler)
 
-    def read_parsed_file_data(self):
-        return utils.read_data_json_file(constants.PARSED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name))
+    def read_parsed_file_data(self) -> Iterator[dict]:
+        return utils.read_jsonl_file(constants.PARSED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name))
 
-    def save_products(self, products: list):
+    def save_products(self, products: Iterable[dict]):
         file_path = constants.PARSED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name)
-        utils.save_data_file(file_relative_path=file_path, data=products)
+        count = utils.save_jsonl_file(file_relative_path=file_path, items=products)
+        self.logger.info(f'{self.shop.name} parsed products saved: {count} products')
 
     @staticmethod
     def parsed_product_attribute_position(product: dict, attribute_name: str):
@@ -155,23 +163,97 @@ class ShopifyParser(ABC):
                 return opt['position']
         return None
 
-    @utils.log_function_call
-    def parse_products(self, scraped_products: list):
-        parsed_products = []
+    def parse_scraped_product(self, product: dict):
+        """Returns the parsed product, or None if the product is unacceptable or can not be parsed."""
+        # Products not modified since the last integrated scrape (see ShopifyScraper.fetch_products)
+        if product.get('unchanged'):
+            return {'product_id': product['id'], 'unchanged': True}
 
-        for product in scraped_products:
-            if self.is_unacceptable_product(product):
-                self.logger.info(f'Product is unacceptable. Product ID: {product["id"]}.')
-                continue
+        if self.is_unacceptable_product(product):
+            self.logger.info(f'Product is unacceptable. Product ID: {product["id"]}.')
+            return None
 
-            try:
-                parsed = self._parse_product(product)
-                parsed_products.append(parsed)
-            except Exception as error:
-                self.logger.exception(f'Product {product["id"]}, ERROR: {error}')
-                continue
+        try:
+            return self._parse_product(product)
+        except Exception as error:
+            self.logger.exception(f'Product {product["id"]}, ERROR: {error}')
+            return None
+
+    def parse_products(self, scraped_products: Iterable[dict], workers: int = None) -> Iterator[dict]:
+        """
+        Yields the parsed products one at a time, so they can be saved as the scraped products are read.
+
+        With more than one worker, the products are parsed in chunks of PARSE_CHUNK_SIZE by a pool of worker
+        processes, with up to two chunks per worker in flight, and yielded in the order of the scraped products.
+        """
+        if not workers or workers <= 1:
+            parsed_products = map(self.parse_scraped_product, scraped_products)
+        else:
+            parsed_products = self._parse_products_in_pool(scraped_products, workers)
+
+        try:
+            for parsed in parsed_products:
+                if parsed is not None:
+                    yield parsed
+        finally:
+            self.save_new_colors()
+
+    def _parse_products_in_pool(self, scraped_products: Iterable[dict], workers: int) -> Iterator[dict]:
+        scraped_products = iter(scraped_products)
+        chunk_requests = deque()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker, initargs=(self,)) as executor:
+            while True:
+                while len(chunk_requests) < workers * 2:
+                    chunk = list(islice(scraped_products, self.PARSE_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    chunk_requests.append(executor.submit(_parse_chunk, chunk))
+
+                if not chunk_requests:
+                    break
+                parsed_products, new_colors = chunk_requests.popleft().result()
+                self.add_colors(new_colors)
+                yield from parsed_products
 
-        return parsed_products
+    def _init_worker(self):
+        # Spawned worker processes start without the log handlers of the parent process
+        if not self.logger.handlers:
+            self.__config_logger()
+
+    def add_colors(self, colors: dict):
+        """
+        Adds colors to the shop colors of the run. They are saved to the colors fixture at the end of parse_products,
+        by the parent process, since the pool workers would overwrite each other's colors file.
+        """
+        if colors:
+            fixtures.get_colors(self.shop.name).update(colors)
+            self._new_colors.update(colors)
+
+    def pop_new_colors(self) -> dict:
+        new_colors, self._new_colors = self._new_colors, {}
+        return new_colors
+
+    def save_new_colors(self):
+        new_colors = self.pop_new_colors()
+        if new_colors:
+            fixtures.save_colors(self.shop.name, new_colors)
+
+
+# Parser of the worker process, set by the pool initializer so it is sent to every worker once, not with every chunk
+_worker_parser = None
+
+
+def _init_parse_worker(parser: ShopifyParser):
+    global _worker_parser
+    _worker_parser = parser
+    parser._init_worker()
+
+
+def _parse_chunk(products: list) -> tuple:
+    """The parsed products of the chunk, and the colors the worker added meanwhile, for the parent to save."""
+    parsed_products = [_worker_parser.parse_scraped_product(product) for product in products]
+    return parsed_products, _worker_parser.pop_new_colors()
 
 
 class KitAndAceParser(ShopifyParser):
@@ -400,8 +482,7 @@ class TristanParser(ShopifyParser):
 
             color_hex = None
             if color_code is not None:
-                data = utils.read_data_json_file(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name))
-                color_hex = next((color['hex'] for color in data if color['code'] == color_code[:2]), None)
+                color_hex = fixtures.get_colors(self.shop.name).get(color_code[:2])
 
             v = {
                 'variant_id': variant['id'],
@@ -427,12 +508,14 @@ class TristanParser(ShopifyParser):
 
         return variants
 
-    def parse_products(self, scraped_products: list):
-        scraped_product_types = set(map(lambda p: p['product_type'], scraped_products))
-        current_product_types = set(self.PRODUCT_TYPES.keys())
-        assert scraped_product_types.issubset(current_product_types), \
-            f'Some scraped product types are not in current product types.\ndifferences: {scraped_product_types.difference(current_product_types)}'
-        return super().parse_products(scraped_products)
+    def _check_product_type(self, product: dict) -> dict:
+        if not product.get('unchanged'):
+            assert product['product_type'] in self.PRODUCT_TYPES, \
+                f'Scraped product type is not in current product types: {product["product_type"]}'
+        return product
+
+    def parse_products(self, scraped_products: Iterable[dict], workers: int = None) -> Iterator[dict]:
+        return super().parse_products(map(self._check_product_type, scraped_products), workers=workers)
 
     def _get_color_option_position(self, product: dict):
         for opt in product['options']:
@@ -687,9 +770,7 @@ class PajarParser(ShopifyParser):
             return None
 
         color_name = color_opt[0]['values'][0]
-
-        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name), 'r') as f:
-            shop_colors = json.load(f)
+        shop_colors = fixtures.get_colors(self.shop.name)
 
         if color_name.upper() in shop_colors:
             if shop_colors[color_name].startswith('#'):
@@ -715,9 +796,6 @@ class PajarParser(ShopifyParser):
                 return None
 
     def __write_colors_converter(self, product: dict):
-        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name), 'r') as f:
-            shop_colors = json.load(f)
-
         url = f'https://s-pc.webyze.com/ProductColors/productGroup-pajar-canada6-{product["id"]}.json'
         response = requests.get(url).json()
 
@@ -725,14 +803,14 @@ class PajarParser(ShopifyParser):
             return None
 
         data = response['data']
+        colors = {}
         color_value = None
         for item in data:
-            shop_colors[item['name']] = item['data']
+            colors[item['name']] = item['data']
             if item['id'] == product['id']:
                 color_value = item['data']
 
-        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name), 'w') as f:
-            f.write(json.dumps(shop_colors, indent=4))
+        self.add_colors(colors)
 
         return color_value
 
@@ -817,8 +895,7 @@ class VessiParser(ShopifyParser):
         return f'{self._product_genders(product)[0]}-{self._product_categories(product)[0]}'
 
     def _get_color_hex(self, product: dict):
-        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name), 'r') as f:
-            color_map = json.load(f)
+        color_map = fixtures.get_colors(self.shop.name)
         color_tags = list(map(lambda ct: color_map[ct[7:]], filter(lambda t: t.startswith('Color:'), product['tags'])))
         return "/".join(color_tags)
 
@@ -906,8 +983,7 @@ class KeenParser(ShopifyParser):
         return variants
 
     def _get_color_hex(self, product: dict):
-        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=self.shop.name), 'r') as f:
-            color_map = json.load(f)
+        color_map = fixtures.get_colors(self.shop.name)
         # Color 'misc' does not load in parsed file
         key = 'filtercolor:'
         colors = list(map(lambda ct: color_map[ct[len(key):]], filter(lambda t: t.startswith(key), product['tags'])))
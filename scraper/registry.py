@@ -0,0 +1,131 @@
+import csv
+import fcntl
+import json
+import os
+import threading
+from collections import Counter
+
+from scraper import constants
+
+
+class FixtureRegistry:
+    """
+    The shop fixtures of the run, loaded once per shop on first use and indexed for lookups:
+    shop categories by (title, gender), size guide rows by size, and colors by name (or by code for the shops with a
+    list of colors).
+    """
+
+    def __init__(self):
+        self._categories = {}
+        self._size_guides = {}
+        self._colors = {}
+        # Fixture files read, per fixture kind
+        self.file_loads = Counter()
+        self._lock = threading.Lock()
+
+    def _load(self, cache: dict, key, loader):
+        if key not in cache:
+            with self._lock:
+                if key not in cache:
+                    cache[key] = loader()
+        return cache[key]
+
+    def _load_categories(self, shop_name: str) -> dict:
+        self.file_loads['categories'] += 1
+        with open(constants.SHOP_CATEGORIES_CONVERTER_FILE_PATH.format(shop_name=shop_name), 'r') as f:
+            shop_categories = json.load(f)
+
+        # The first category of a (title, gender) is the one used
+        categories = {}
+        for category in shop_categories:
+            categories.setdefault((category['title'], category['gender']), category)
+        return categories
+
+    def _load_size_guide(self, shop_name: str, size_guide_type: str) -> dict:
+        self.file_loads['size_guides'] += 1
+        file_path = constants.SHOP_SIZE_GUIDES_FILE_PATH.format(shop_name=shop_name, size_guide_type=size_guide_type)
+        try:
+            with open(file_path, 'r') as csv_file:
+                rows = tuple(csv.DictReader(csv_file))
+        except FileNotFoundError:
+            return None  # Missing size guides are looked up once too
+
+        # The first row of a size is the one used
+        size_guide = {}
+        for row in rows:
+            size_guide.setdefault(row['Size'], row)
+        return size_guide
+
+    def _load_colors(self, shop_name: str) -> dict:
+        self.file_loads['colors'] += 1
+        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=shop_name), 'r') as f:
+            colors = json.load(f)
+
+        if isinstance(colors, list):  # e.g. Tristan: [{'color': ..., 'code': ..., 'hex': ...}]
+            colors_by_code = {}
+            for color in colors:
+                colors_by_code.setdefault(color['code'], color['hex'])
+            return colors_by_code
+        return colors
+
+    def get_category(self, shop_name: str, title: str, gender: str):
+        """The shop category of the title and gender, with its equivalent chicpic category name, or None."""
+        categories = self._load(self._categories, shop_name, lambda: self._load_categories(shop_name))
+        return categories.get((title, gender))
+
+    def get_size_guide(self, shop_name: str, size_guide_type: str) -> dict:
+        """Size -> row of the size guide. Raises FileNotFoundError if the shop has no such size guide."""
+        size_guide = self._load(self._size_guides, (shop_name, size_guide_type),
+                                lambda: self._load_size_guide(shop_name, size_guide_type))
+        if size_guide is None:
+            raise FileNotFoundError(f'Size guide not found. shop: {shop_name}, size guide: {size_guide_type}.')
+        return size_guide
+
+    def get_size_guide_row(self, shop_name: str, size_guide_type: str, size: str):
+        """A copy of the size guide row of the size, or None."""
+        row = self.get_size_guide(shop_name, size_guide_type).get(size)
+        return dict(row) if row is not None else None
+
+    def get_colors(self, shop_name: str) -> dict:
+        """Color name (or code) -> color value of the shop. Changes to the dict are seen by the next lookups."""
+        return self._load(self._colors, shop_name, lambda: self._load_colors(shop_name))
+
+    def save_colors(self, shop_name: str, colors: dict):
+        """
+        Adds the colors to the colors fixture of the shop (name -> value fixtures). The file is read again under an
+        exclusive lock of the fixtures directory, so the colors other processes saved meanwhile are kept, and it is
+        replaced atomically.
+        """
+        file_path = constants.COLORS_CONVERTER_FILE_PATH.format(shop_name=shop_name)
+        tmp_file_path = f'{file_path}.tmp'
+        directory_fd = os.open(os.path.dirname(file_path), os.O_RDONLY)
+        try:
+            with self._lock:
+                fcntl.flock(directory_fd, fcntl.LOCK_EX)
+                with open(file_path, 'r') as f:
+                    saved_colors = json.load(f)
+                saved_colors.update(colors)
+
+                try:
+                    with open(tmp_file_path, 'w') as f:
+                        f.write(json.dumps(saved_colors, indent=4))
+                except BaseException:
+                    os.remove(tmp_file_path)
+                    raise
+                os.replace(tmp_file_path, file_path)
+
+                if shop_name in self._colors:
+                    self._colors[shop_name].update(saved_colors)
+        finally:
+            # Closing the directory releases the lock
+            os.close(directory_fd)
+
+    def clear(self):
+        with self._lock:
+            self._categories.clear()
+            self._size_guides.clear()
+            self._colors.clear()
+
+
+# Registry of the run, shared by the parsers and the converters
+fixtures = FixtureRegistry()
@@ -1,15 +1,33 @@
 import os
 from abc import ABC
-import requests
 import logging
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 
 from scraper import utils, constants
+from scraper.sessions import ScraperSession
 
 
 class ShopifyScraper(ABC):
-    def __init__(self, shop: constants.ShopConstant):
+    # Products per page of products.json (the Shopify maximum)
+    PAGE_SIZE = 250
+    # Pages requested concurrently by fetch_products
+    PAGES_IN_FLIGHT = 4
+    # Fields of the scraped products read by the parsers and the incremental scrapes; the others are dropped
+    PRODUCT_FIELDS = ('id', 'title', 'handle', 'body_html', 'vendor', 'product_type', 'tags', 'updated_at', 'options',
+                      'variants', 'images')
+    OPTION_FIELDS = ('name', 'position', 'values')
+    VARIANT_FIELDS = ('id', 'product_id', 'available', 'price', 'compare_at_price', 'option1', 'option2', 'option3',
+                      'featured_image')
+    IMAGE_FIELDS = ('src', 'width', 'height')
+
+    def __init__(self, shop: constants.ShopConstant, session: ScraperSession = None):
         self.shop = shop
+        # Keep-alive connections, timeouts and retries, and the request stats of the run
+        self.session = session or ScraperSession(pool_maxsize=max(10, self.PAGES_IN_FLIGHT))
+        # Page ETags and product updated_at of the last fetch (see read_scrape_state)
+        self.scrape_state = None
         self.__config_logger()
 
     def __config_logger(self):
@@ -35,12 +53,30 @@ class ShopifyScraper(ABC):
         file_handler.setLevel(level=logging.INFO)
         self.logger.addHandler(file_handler)
 
-    def read_scraped_file_data(self):
-        return utils.read_data_json_file(constants.SCRAPED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name))
+    def read_scraped_file_data(self) -> Iterator[dict]:
+        return utils.read_jsonl_file(constants.SCRAPED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name))
 
-    def save_products(self, products: list):
+    def save_products(self, products: Iterable[dict]):
         file_path = constants.SCRAPED_PRODUCTS_FILE_PATH.format(shop_name=self.shop.name)
-        utils.save_data_file(file_relative_path=file_path, data=products)
+        utils.save_jsonl_file(file_relative_path=file_path, items=products)
+
+    @classmethod
+    def prune_product(cls, product: dict) -> dict:
+        """Returns the product with only the fields of PRODUCT_FIELDS, and the first image only."""
+        def pick(data: dict, fields: tuple):
+            return {field: data[field] for field in fields if field in data}
+
+        pruned = pick(product, cls.PRODUCT_FIELDS)
+        if 'options' in pruned:
+            pruned['options'] = [pick(option, cls.OPTION_FIELDS) for option in pruned['options']]
+        if 'variants' in pruned:
+            pruned['variants'] = [pick(variant, cls.VARIANT_FIELDS) for variant in pruned['variants']]
+            for variant in pruned['variants']:
+                if variant.get('featured_image'):
+                    variant['featured_image'] = pick(variant['featured_image'], cls.IMAGE_FIELDS)
+        if 'images' in pruned:
+            pruned['images'] = [pick(image, cls.IMAGE_FIELDS) for image in pruned['images'][:1]]
+        return pruned
 
     @staticmethod
     def get_vendor_counts(products: list) -> Counter:
@@ -79,24 +115,105 @@ class ShopifyScraper(ABC):
 
         return values
 
-    @utils.log_function_call
-    def fetch_products(self):
-        products = []
-        page = 1
+    def read_scrape_state(self) -> dict:
+        """
+        State of the last integrated scrape of the shop: the ETag and product ids of every page, and the updated_at
+        of every product.
+        """
+        file_path = constants.SCRAPE_STATE_FILE_PATH.format(shop_name=self.shop.name)
+        if not os.path.exists(file_path):
+            return {'pages': {}, 'products': {}}
+        return utils.read_data_json_file(file_path)
+
+    def save_scrape_state(self):
+        if self.scrape_state is None:
+            return
+        # The state becomes the base of incremental scrapes once the products are integrated (commit_scrape_state)
+        file_path = constants.PENDING_SCRAPE_STATE_FILE_PATH.format(shop_name=self.shop.name)
+        utils.save_data_file(file_relative_path=file_path, data=self.scrape_state)
+
+    def commit_scrape_state(self):
+        pending_file_path = constants.PENDING_SCRAPE_STATE_FILE_PATH.format(shop_name=self.shop.name)
+        if os.path.exists(pending_file_path):
+            os.replace(pending_file_path, constants.SCRAPE_STATE_FILE_PATH.format(shop_name=self.shop.name))
 
-        while True:
-            url = f'{self.shop.website}products.json?limit=250&page={page}'
-            print(f'Request URL: {url}')
-            response = requests.get(url=url)
-            data = response.json()
-
-            if len(data.get('products')) == 0:
-                break
-            else:
-                products += data.get('products')
-                page += 1
-
-        return products
+    @staticmethod
+    def unchanged_product(product_id: int, updated_at: str) -> dict:
+        return {'id': product_id, 'updated_at': updated_at, 'unchanged': True}
+
+    def fetch_page(self, page: int, etag: str = None) -> tuple:
+        """Returns the products of the page and its ETag. Products are None when the page still matches the etag."""
+        url = f'{self.shop.website}products.json?limit={self.PAGE_SIZE}&page={page}'
+        print(f'Request URL: {url}')
+        response = self.session.get(url=url, headers={'If-None-Match': etag} if etag else None)
+        if response.status_code == 304:
+            return None, etag
+        response.raise_for_status()
+        return response.json().get('products'), response.headers.get('ETag')
+
+    def fetch_products(self, pages_in_flight: int = None, incremental: bool = False) -> Iterator[dict]:
+        """
+        Fetches the pages of products.json with up to pages_in_flight requests at a time, and yields their products
+        in page order as each page arrives, so only the pages in flight are held in memory. The first empty page ends
+        the products, the pages requested past it are discarded. A shorter page is not the last one, since shops can
+        serve fewer products per page than PAGE_SIZE.
+
+        Incremental fetches request the pages conditionally, with the ETags of the last integrated scrape, and yield
+        the products of unmodified pages and the products with the same updated_at as unchanged products (see
+        unchanged_product), which the parser and the integrator skip.
+
+        The scrape state is complete once all the products are consumed (see save_scrape_state).
+        """
+        pages_in_flight = pages_in_flight or self.PAGES_IN_FLIGHT
+        last_state = self.read_scrape_state() if incremental else {'pages': {}, 'products': {}}
+        self.scrape_state = {'pages': {}, 'products': {}}
+        products_count = 0
+        unchanged_count = 0
+        next_page = 1
+        page_requests = deque()
+
+        with ThreadPoolExecutor(max_workers=pages_in_flight) as executor:
+            try:
+                while True:
+                    while len(page_requests) < pages_in_flight:
+                        etag = last_state['pages'].get(str(next_page), {}).get('etag')
+                        page_requests.append((next_page, executor.submit(self.fetch_page, next_page, etag)))
+                        next_page += 1
+
+                    page, page_request = page_requests.popleft()
+                    page_products, etag = page_request.result()
+                    if page_products is None:  # Not modified
+                        page_product_ids = last_state['pages'][str(page)]['product_ids']
+                        page_updates = {product_id: last_state['products'][str(product_id)]
+                                        for product_id in page_product_ids}
+                        products = [self.unchanged_product(product_id, updated_at)
+                                    for product_id, updated_at in page_updates.items()]
+                    else:
+                        page_product_ids = [product['id'] for product in page_products]
+                        page_updates = {product['id']: product.get('updated_at') for product in page_products}
+                        products = [
+                            self.unchanged_product(product['id'], product['updated_at'])
+                            if product.get('updated_at') and
+                            last_state['products'].get(str(product['id'])) == product['updated_at']
+                            else self.prune_product(product)
+                            for product in page_products
+                        ]
+
+                    self.scrape_state['pages'][str(page)] = {'etag': etag, 'product_ids': page_product_ids}
+                    self.scrape_state['products'].update((str(product_id), updated_at)
+                                                         for product_id, updated_at in page_updates.items())
+                    if not page_product_ids:
+                        break
+
+                    products_count += len(products)
+                    unchanged_count += sum(1 for product in products if product.get('unchanged'))
+                    yield from products
+            finally:
+                for _, page_request in page_requests:
+                    page_request.cancel()
+
+        self.logger.info(f'{self.shop.name} products fetched: {products_count} products ({unchanged_count} unchanged), '
+                         f'{self.session.stats}')
 
 
 class KitAndAceScraper(ShopifyScraper):
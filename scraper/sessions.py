@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionStats:
+    """Requests, retries and received bytes of a session. Shared by the threads fetching pages concurrently."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record_response(self, response: requests.Response):
+        with self._lock:
+            self.requests += 1
+            self.bytes += len(response.content)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def as_dict(self):
+        return {'requests': self.requests, 'retries': self.retries, 'bytes': self.bytes}
+
+    def __str__(self):
+        return f'{self.requests} requests, {self.retries} retries, {self.bytes / 1024 / 1024:.1f} MB'
+
+
+class ScraperSession(requests.Session):
+    """
+    Keep-alive session of a scraper run, with a connection pool per host, default timeouts, and retries of
+    connection errors, timeouts, 429 and 5xx responses.
+
+    Retries wait for the Retry-After of the response when it has one, and otherwise back off exponentially with
+    full jitter: a random delay between 0 and backoff_factor * 2 ** attempt, capped at backoff_max seconds.
+    """
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, timeout=(5, 30), max_retries=5, backoff_factor=0.5, backoff_max=60, pool_maxsize=10):
+        super().__init__()
+        # (connect, read) timeouts in seconds
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.stats = SessionStats()
+
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = super().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.get_backoff(attempt)
+            else:
+                self.stats.record_response(response)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                delay = self.get_retry_after(response)
+                if delay is None:
+                    delay = self.get_backoff(attempt)
+
+            self.stats.record_retry()
+            attempt += 1
+            time.sleep(delay)
+
+    def get_backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+    def get_retry_after(self, response: requests.Response):
+        """Seconds to wait from the Retry-After header (seconds or an HTTP date), or None if there isn't one."""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is None:
+            return None
+
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0), self.backoff_max)
@@ -0,0 +1,413 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+from requests import HTTPError, Response
+
+from scraper import constants, utils
+from scraper.benchmarks import generate_scraped_products
+from scraper.parsers import KitAndAceParser, PajarParser
+from scraper.registry import FixtureRegistry
+from scraper.scrapers import ShopifyScraper
+from scraper.sessions import ScraperSession
+
+
+def setUpModule():
+    # The scrapers, parsers and converters add file handlers to the root logger, for the files of LOGS_DIR
+    logs_dir = tempfile.mkdtemp()
+    root_handlers = list(logging.getLogger().handlers)
+    for name, value in (('LOGS_DIR', logs_dir), ('LOGS_FILE_PATH', os.path.join(logs_dir, '{module_name}.log'))):
+        patcher = mock.patch.object(constants, name, value)
+        patcher.start()
+        unittest.addModuleCleanup(patcher.stop)
+
+    def remove_handlers():
+        for handler in logging.getLogger().handlers:
+            if handler not in root_handlers:
+                logging.getLogger().removeHandler(handler)
+                handler.close()
+        shutil.rmtree(logs_dir)
+
+    unittest.addModuleCleanup(remove_handlers)
+
+
+class StubShopifyHandler(BaseHTTPRequestHandler):
+    """
+    Serves products.json pages of server.products, of up to server.max_limit products if set, with ETags, and
+    records the requested pages and the ones not modified. The statuses in server.failures[page] are returned first, one per request of the page.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        limit = min(int(query['limit'][0]), self.server.max_limit or float('inf'))
+        page = int(query['page'][0])
+        self.server.requested_pages.append(page)
+
+        failures = self.server.failures.get(page)
+        if failures:
+            self.send_response(failures.pop(0))
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps({'products': self.server.products[(page - 1) * limit:page * limit]}).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.not_modified_pages.append(page)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubShopifyServerMixin:
+    def start_stub_server(self, products):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubShopifyHandler)
+        server.products = products
+        server.requested_pages = []
+        server.failures = {}
+        server.not_modified_pages = []
+        server.max_limit = None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def get_scraper(self, server, session=None):
+        shop = constants.ShopConstant(name='Stub', website=f'http://127.0.0.1:{server.server_port}/')
+        return ShopifyScraper(shop, session=session)
+
+
+class FetchProductsTest(StubShopifyServerMixin, SimpleTestCase):
+    def test_fetch_products_in_page_order(self):
+        products = [{'id': product_id} for product_id in range(1, 1001)]
+        server = self.start_stub_server(products)
+
+        fetched_products = list(self.get_scraper(server).fetch_products(pages_in_flight=3))
+
+        self.assertEqual(fetched_products, products)
+        # 4 full pages and the empty last page, then at most pages_in_flight - 1 requests past it
+        self.assertTrue({1, 2, 3, 4, 5}.issubset(server.requested_pages))
+        self.assertLessEqual(max(server.requested_pages), 5 + 3 - 1)
+
+    def test_fetch_products_sequentially(self):
+        products = [{'id': product_id} for product_id in range(1, 501)]
+        server = self.start_stub_server(products)
+
+        fetched_products = list(self.get_scraper(server).fetch_products(pages_in_flight=1))
+
+        self.assertEqual(fetched_products, products)
+        self.assertEqual(server.requested_pages, [1, 2, 3])
+
+    def test_fetch_products_lazily(self):
+        products = [{'id': product_id} for product_id in range(1, 501)]
+        server = self.start_stub_server(products)
+
+        fetched_products = self.get_scraper(server).fetch_products(pages_in_flight=1)
+
+        # The products of a page are yielded before the next page is requested
+        self.assertEqual(server.requested_pages, [])
+        self.assertEqual(next(fetched_products), products[0])
+        self.assertEqual(server.requested_pages, [1])
+        self.assertEqual(list(fetched_products), products[1:])
+
+    def test_pages_shorter_than_the_limit(self):
+        products = [{'id': product_id} for product_id in range(1, 301)]
+        server = self.start_stub_server(products)
+        # The shop serves 100 products per page at most
+        server.max_limit = 100
+
+        fetched_products = list(self.get_scraper(server).fetch_products(pages_in_flight=1))
+
+        self.assertEqual(fetched_products, products)
+        self.assertEqual(server.requested_pages, [1, 2, 3, 4])
+
+
+class IncrementalFetchTest(StubShopifyServerMixin, SimpleTestCase):
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        os.mkdir(os.path.join(data_dir.name, 'Stub'))
+        for name in ('SCRAPE_STATE_FILE_PATH', 'PENDING_SCRAPE_STATE_FILE_PATH'):
+            file_name = os.path.basename(getattr(constants, name))
+            patcher = mock.patch.object(constants, name, os.path.join(data_dir.name, '{shop_name}', file_name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scrape(self, server, incremental):
+        scraper = self.get_scraper(server)
+        products = list(scraper.fetch_products(pages_in_flight=2, incremental=incremental))
+        scraper.save_scrape_state()
+        return scraper, products
+
+    def test_fetch_changed_products(self):
+        products = [{'id': product_id, 'updated_at': '2024-01-01T00:00:00-05:00'} for product_id in range(1, 601)]
+        server = self.start_stub_server(products)
+        scraper, _ = self.scrape(server, incremental=False)
+        scraper.commit_scrape_state()
+
+        products[300]['updated_at'] = '2024-02-01T00:00:00-05:00'
+        server.requested_pages = []
+        _, fetched_products = self.scrape(server, incremental=True)
+
+        self.assertEqual(len(fetched_products), 600)
+        self.assertEqual(fetched_products[300], products[300])
+        self.assertEqual([product['id'] for product in fetched_products if not product.get('unchanged')], [301])
+        self.assertEqual(fetched_products[0], ShopifyScraper.unchanged_product(1, '2024-01-01T00:00:00-05:00'))
+        # Pages 1 and 3 did not change since the last scrape
+        self.assertTrue({1, 3}.issubset(server.not_modified_pages))
+        self.assertNotIn(2, server.not_modified_pages)
+
+    def test_uncommitted_state(self):
+        products = [{'id': product_id, 'updated_at': '2024-01-01T00:00:00-05:00'} for product_id in range(1, 101)]
+        server = self.start_stub_server(products)
+        self.scrape(server, incremental=False)
+
+        # The products of a scrape that was not integrated are fetched again
+        _, fetched_products = self.scrape(server, incremental=True)
+
+        self.assertEqual(fetched_products, products)
+        self.assertEqual(server.not_modified_pages, [])
+
+
+class ProductFilesTest(SimpleTestCase):
+    def test_jsonl_file(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        file_path = os.path.join(data_dir.name, 'Stub', 'products.jsonl')
+        products = ({'id': product_id, 'title': f'Product {product_id}'} for product_id in range(1, 101))
+
+        self.assertEqual(utils.save_jsonl_file(file_relative_path=file_path, items=products), 100)
+        with open(file_path) as f:
+            self.assertEqual(f.readline(), '{"id": 1, "title": "Product 1"}\n')
+
+        read_products = utils.read_jsonl_file(file_path)
+        self.assertEqual(next(read_products), {'id': 1, 'title': 'Product 1'})
+        self.assertEqual(len(list(read_products)), 99)
+
+    def test_failed_save_keeps_file(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        file_path = os.path.join(data_dir.name, 'products.jsonl')
+        utils.save_jsonl_file(file_relative_path=file_path, items=[{'id': 1}])
+
+        def products():
+            yield {'id': 2}
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            utils.save_jsonl_file(file_relative_path=file_path, items=products())
+        self.assertEqual(list(utils.read_jsonl_file(file_path)), [{'id': 1}])
+        self.assertEqual(os.listdir(data_dir.name), ['products.jsonl'])
+
+    def test_prune_product(self):
+        image = {'id': 11, 'product_id': 1, 'position': 1, 'src': 'https://cdn/1.jpg', 'width': 800, 'height': 1000,
+                 'alt': None, 'variant_ids': [21]}
+        product = {
+            'id': 1, 'title': 'Shirt', 'handle': 'shirt', 'body_html': '<p>Shirt</p>', 'published_at': '2024-01-01',
+            'created_at': '2024-01-01', 'updated_at': '2024-01-02', 'vendor': 'Stub', 'product_type': 'Shirts',
+            'tags': ['Men'], 'options': [{'name': 'Size', 'position': 1, 'values': ['M']}],
+            'variants': [{'id': 21, 'product_id': 1, 'title': 'M', 'sku': 'S-M', 'available': True, 'price': '10.00',
+                          'compare_at_price': None, 'option1': 'M', 'option2': None, 'option3': None,
+                          'grams': 200, 'requires_shipping': True, 'featured_image': image}],
+            'images': [image, {**image, 'id': 12, 'src': 'https://cdn/2.jpg'}],
+        }
+
+        pruned = ShopifyScraper.prune_product(product)
+
+        self.assertEqual(set(pruned), set(ShopifyScraper.PRODUCT_FIELDS))
+        self.assertEqual(pruned['variants'][0], {
+            'id': 21, 'product_id': 1, 'available': True, 'price': '10.00', 'compare_at_price': None,
+            'option1': 'M', 'option2': None, 'option3': None,
+            'featured_image': {'src': 'https://cdn/1.jpg', 'width': 800, 'height': 1000},
+        })
+        self.assertEqual(pruned['images'], [{'src': 'https://cdn/1.jpg', 'width': 800, 'height': 1000}])
+
+
+class ParseProductsTest(SimpleTestCase):
+    def get_scraped_products(self):
+        products = generate_scraped_products(50)
+        products[10]['product_type'] = 'Gift Cards'  # Unacceptable
+        del products[20]['variants']  # Fails to parse
+        products[30] = ShopifyScraper.unchanged_product(products[30]['id'], products[30]['updated_at'])
+        return products
+
+    def test_parse_products(self):
+        parsed_products = list(KitAndAceParser().parse_products(self.get_scraped_products()))
+
+        self.assertEqual(len(parsed_products), 48)
+        self.assertNotIn(11, [product['product_id'] for product in parsed_products])
+        self.assertNotIn(21, [product['product_id'] for product in parsed_products])
+        self.assertEqual(parsed_products[28], {'product_id': 31, 'unchanged': True})
+
+    def test_parse_products_in_pool(self):
+        parser = KitAndAceParser()
+        parser.PARSE_CHUNK_SIZE = 7
+        scraped_products = self.get_scraped_products()
+
+        self.assertEqual(list(parser.parse_products(iter(scraped_products), workers=3)),
+                         list(parser.parse_products(scraped_products)))
+
+    def test_new_colors_in_pool(self):
+        colors_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(colors_dir.cleanup)
+        colors_file_path = os.path.join(colors_dir.name, '{shop_name}.json')
+        shutil.copy(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name='Pajar'),
+                    colors_file_path.format(shop_name='Pajar'))
+
+        # Pajar products in colors missing from the fixture, which the parser looks up on webyze
+        products = generate_scraped_products(20)
+        for product in products:
+            product['title'] = f"Women's Jacket {product['id']}"
+            product['tags'] = ['_tabs_womens-outerwear-nude-body-measurements']
+            product['options'][0]['values'] = [f'COLOR {product["id"]}']
+
+        def get_product_colors(url):
+            product_id = int(url.rsplit('-', 1)[1].removesuffix('.json'))
+            response = mock.Mock()
+            response.json.return_value = {'data': [{'id': product_id, 'name': f'COLOR {product_id}',
+                                                    'data': f'#{product_id:06d}'}]}
+            return response
+
+        parser = PajarParser()
+        parser.PARSE_CHUNK_SIZE = 3
+        with mock.patch.object(constants, 'COLORS_CONVERTER_FILE_PATH', colors_file_path), \
+                mock.patch('scraper.parsers.fixtures', FixtureRegistry()), \
+                mock.patch('scraper.parsers.requests.get', side_effect=get_product_colors):
+            parsed_products = list(parser.parse_products(products, workers=3))
+
+        self.assertEqual([product['variants'][0]['color_hex'] for product in parsed_products],
+                         [f'{product_id:06d}' for product_id in range(1, 21)])
+        # The colors of every worker are saved
+        with open(colors_file_path.format(shop_name='Pajar')) as f:
+            saved_colors = json.load(f)
+        self.assertEqual({f'COLOR {product_id}' for product_id in range(1, 21)} - set(saved_colors), set())
+        self.assertEqual(saved_colors['BLACK'], '#000000')
+
+
+class FixtureRegistryTest(SimpleTestCase):
+    def test_fixtures_loaded_once(self):
+        registry = FixtureRegistry()
+
+        for _ in range(3):
+            self.assertEqual(registry.get_category('Kit and Ace', 'Pants', 'Women')['equivalent_chicpic_name'],
+                             'Bottoms')
+            self.assertEqual(registry.get_colors('Kit and Ace').get('Black'), '27272A')
+            self.assertEqual(registry.get_size_guide_row('Kit and Ace', 'Women-Tops', 'S')['Size'], 'S')
+
+        self.assertEqual(registry.file_loads, {'categories': 1, 'colors': 1, 'size_guides': 1})
+
+    def test_size_guide_rows(self):
+        registry = FixtureRegistry()
+        with open(constants.SHOP_SIZE_GUIDES_FILE_PATH.format(shop_name='Kit and Ace',
+                                                             size_guide_type='Men-Bottoms')) as f:
+            first_m_row = next(row for row in csv.DictReader(f) if row['Size'] == 'M')
+
+        # The first row of a size, as a copy the converters can change
+        row = registry.get_size_guide_row('Kit and Ace', 'Men-Bottoms', 'M')
+        self.assertEqual(row, first_m_row)
+        row.pop('Size')
+        self.assertEqual(registry.get_size_guide_row('Kit and Ace', 'Men-Bottoms', 'M'), first_m_row)
+        self.assertIsNone(registry.get_size_guide_row('Kit and Ace', 'Men-Bottoms', 'XXXL'))
+
+        for _ in range(2):
+            with self.assertRaises(FileNotFoundError):
+                registry.get_size_guide('Kit and Ace', 'Unknown')
+        self.assertEqual(registry.file_loads['size_guides'], 2)
+
+    def test_colors_by_code(self):
+        registry = FixtureRegistry()
+        with open(constants.COLORS_CONVERTER_FILE_PATH.format(shop_name='Tristan')) as f:
+            color = json.load(f)[0]
+
+        self.assertEqual(registry.get_colors('Tristan')[color['code']], color['hex'])
+
+    def test_save_colors(self):
+        colors_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(colors_dir.cleanup)
+        colors_file_path = os.path.join(colors_dir.name, '{shop_name}.json')
+        with open(colors_file_path.format(shop_name='Shop'), 'w') as f:
+            json.dump({'BLACK': '#000000'}, f)
+
+        registry = FixtureRegistry()
+        with mock.patch.object(constants, 'COLORS_CONVERTER_FILE_PATH', colors_file_path):
+            self.assertEqual(registry.get_colors('Shop'), {'BLACK': '#000000'})
+
+            # Registries of other processes, saving at the same time
+            def save_colors(worker):
+                other_registry = FixtureRegistry()
+                for index in range(5):
+                    other_registry.save_colors('Shop', {f'COLOR {worker}-{index}': f'#{worker}{index}0000'})
+
+            threads = [threading.Thread(target=save_colors, args=(worker,)) for worker in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            registry.save_colors('Shop', {'WHITE': '#ffffff'})
+
+        with open(colors_file_path.format(shop_name='Shop')) as f:
+            saved_colors = json.load(f)
+        self.assertEqual(len(saved_colors), 42)
+        self.assertEqual(saved_colors['COLOR 7-4'], '#740000')
+        # The cached colors include the ones saved by the others
+        self.assertEqual(registry.get_colors('Shop'), saved_colors)
+        self.assertEqual(os.listdir(colors_dir.name), ['Shop.json'])
+
+
+class ScraperSessionTest(StubShopifyServerMixin, SimpleTestCase):
+    def test_retries(self):
+        products = [{'id': product_id} for product_id in range(1, 301)]
+        server = self.start_stub_server(products)
+        server.failures = {1: [429, 503], 2: [502]}
+        session = ScraperSession(backoff_factor=0.01)
+
+        fetched_products = list(self.get_scraper(server, session=session).fetch_products(pages_in_flight=1))
+
+        self.assertEqual(fetched_products, products)
+        self.assertEqual(server.requested_pages, [1, 1, 1, 2, 2, 3])
+        self.assertEqual(session.stats.requests, 6)
+        self.assertEqual(session.stats.retries, 3)
+        self.assertGreater(session.stats.bytes, 0)
+
+    def test_retries_exhausted(self):
+        server = self.start_stub_server([])
+        server.failures = {1: [503, 503, 503]}
+        session = ScraperSession(max_retries=2, backoff_factor=0.01)
+
+        with self.assertRaises(HTTPError):
+            list(self.get_scraper(server, session=session).fetch_products(pages_in_flight=1))
+        self.assertEqual(session.stats.retries, 2)
+
+    def test_retry_after(self):
+        session = ScraperSession(backoff_max=10)
+        response = Response()
+        response.headers['Retry-After'] = '3'
+        self.assertEqual(session.get_retry_after(response), 3)
+        response.headers['Retry-After'] = '120'
+        self.assertEqual(session.get_retry_after(response), 10)
+        response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(session.get_retry_after(response), 0)
@@ -2,6 +2,7 @@ import json
 import os
 import re
 import logging
+from typing import Iterable, Iterator
 
 def log_function_call(func):
 
@@ -55,6 +56,48 @@ def save_data_file(file_relative_path: str, data: list):
         f.write(json.dumps(data))
 
 
+def save_jsonl_file(file_relative_path: str, items: Iterable) -> int:
+    # Get absolute address of this package
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Get absolute address of file
+    file_path = os.path.join(package_dir, file_relative_path)
+
+    # Make directory if it does not exist
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Save one item per line as the items are produced, and replace the file once they are all written, so a failed
+    # run leaves the previous file as it was
+    count = 0
+    tmp_file_path = f'{file_path}.tmp'
+    try:
+        with open(tmp_file_path, 'w') as f:
+            for item in items:
+                f.write(json.dumps(item))
+                f.write('\n')
+                count += 1
+    except BaseException:
+        os.remove(tmp_file_path)
+        raise
+    os.replace(tmp_file_path, file_path)
+
+    return count
+
+
+def read_jsonl_file(file_path: str) -> Iterator:
+    # Get absolute address of this package
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Get absolute address of file
+    file_path = os.path.join(package_dir, file_path)
+
+    # Read the items one line at a time
+    with open(file_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
 def read_data_json_file(file_path: str):
     # Get absolute address of this package
     package_dir = os.path.dirname(os.path.abspath(__file__))
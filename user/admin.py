@@ -1,5 +1,5 @@
 from django.contrib import admin, messages
-from user.models import User, DeletedUser, UserAdditional, ShirtFit, TrouserFit
+from user.models import User, DeletedUser, UserAdditional, ShirtFit, TrouserFit, SavedSize
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -70,3 +70,4 @@ admin.site.register(DeletedUser, DeletedUserAdmin)
 admin.site.register(UserAdditional)
 admin.site.register(ShirtFit)
 admin.site.register(TrouserFit)
+admin.site.register(SavedSize)
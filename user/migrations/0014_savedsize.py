@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0013_deleteduser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSize',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size_code', models.CharField(max_length=20)),
+                ('user_additional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.useradditional')),
+            ],
+            options={
+                'unique_together': {('user_additional', 'size_code')},
+            },
+        ),
+    ]
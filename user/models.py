@@ -77,6 +77,10 @@ class UserAdditional(models.Model):
     def trouser_fits(self):
         return TrouserFit.objects.filter(user_additional=self)
 
+    @property
+    def saved_sizes(self):
+        return SavedSize.objects.filter(user_additional=self)
+
     def clean(self):
         if self.gender_interested == GenderChoices.MEN and not self.chest_size:
             raise ValidationError("Chest size should not be empty for men's clothing.")
@@ -118,6 +122,15 @@ class TrouserFit(models.Model):
         unique_together = ('user_additional', 'fit_type')
 
 
+class SavedSize(models.Model):
+    user_additional = models.ForeignKey(UserAdditional, on_delete=models.CASCADE)
+    # Canonical size code, e.g. 'W-TOP:M' (see clothing.sizes)
+    size_code = models.CharField(max_length=20)
+
+    class Meta:
+        unique_together = ('user_additional', 'size_code')
+
+
 class OTP(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
@@ -4,7 +4,8 @@ from rest_framework.exceptions import AuthenticationFailed
 from django.utils import timezone
 
 from django.contrib.auth import get_user_model
-from .models import OTP, UserAdditional, ShirtFit, TrouserFit
+from clothing.sizes import is_valid_size_code
+from .models import OTP, UserAdditional, ShirtFit, TrouserFit, SavedSize
 
 User = get_user_model()
 
@@ -23,17 +24,37 @@ class TrouserFitSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'user_additional')
 
 
+class SavedSizeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedSize
+        fields = '__all__'
+        read_only_fields = ('id', 'user_additional')
+
+    def validate_size_code(self, value):
+        if not is_valid_size_code(value):
+            raise serializers.ValidationError('Invalid size code.')
+        return value
+
+
 class UserAdditionalSerializer(serializers.ModelSerializer):
     shirt_fits = ShirtFitSerializer(many=True, required=False)
     trouser_fits = TrouserFitSerializer(many=True, required=False)
+    saved_sizes = SavedSizeSerializer(many=True, required=False)
 
     class Meta:
         model = UserAdditional
         fields = '__all__'
 
+    def validate_saved_sizes(self, saved_sizes):
+        size_codes = [saved_size['size_code'] for saved_size in saved_sizes]
+        if len(set(size_codes)) != len(size_codes):
+            raise serializers.ValidationError('Saved sizes must be unique.')
+        return saved_sizes
+
     def create(self, validated_data):
         shirt_fits_data = validated_data.pop('shirt_fits', [])
         trouser_fits_data = validated_data.pop('trouser_fits', [])
+        saved_sizes_data = validated_data.pop('saved_sizes', [])
 
         user_additional = UserAdditional.objects.create(**validated_data)
 
@@ -43,11 +64,15 @@ class UserAdditionalSerializer(serializers.ModelSerializer):
         for trouser_fit_data in trouser_fits_data:
             TrouserFit.objects.create(user_additional=user_additional, **trouser_fit_data)
 
+        for saved_size_data in saved_sizes_data:
+            SavedSize.objects.create(user_additional=user_additional, **saved_size_data)
+
         return user_additional
 
     def update(self, instance, validated_data):
         shirt_fits_data = validated_data.pop('shirt_fits', [])
         trouser_fits_data = validated_data.pop('trouser_fits', [])
+        saved_sizes_data = validated_data.pop('saved_sizes', None)
 
         user_additional = super().update(instance, validated_data)
 
@@ -60,6 +85,12 @@ class UserAdditionalSerializer(serializers.ModelSerializer):
         for trouser_fit_data in trouser_fits_data:
             TrouserFit.objects.create(user_additional=user_additional, **trouser_fit_data)
 
+        # Saved sizes are kept when they are not sent
+        if saved_sizes_data is not None:
+            SavedSize.objects.filter(user_additional=user_additional).delete()
+            for saved_size_data in saved_sizes_data:
+                SavedSize.objects.create(user_additional=user_additional, **saved_size_data)
+
         return user_additional
 
 
@@ -4,7 +4,7 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 
 from django.contrib.auth import get_user_model
-from .models import OTP
+from .models import OTP, SavedSize
 
 User = get_user_model()
 
@@ -202,10 +202,12 @@ class UserAdditionalTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual({'id', 'user', 'weight', 'height', 'chestSize', 'bustSize', 'waistSize', 'hipsSize',
-                          'shoulderSize', 'inseam', 'shoeSize', 'genderInterested', 'shirtFits', 'trouserFits'},
+                          'shoulderSize', 'inseam', 'shoeSize', 'genderInterested', 'shirtFits', 'trouserFits',
+                          'savedSizes'},
                          set(response.json().keys()))
         self.assertEqual([], response.json().get('shirtFits'))
         self.assertEqual([], response.json().get('trouserFits'))
+        self.assertEqual([], response.json().get('savedSizes'))
 
         user_additional2_data = {
             "user": self.user2.id,
@@ -245,6 +247,35 @@ class UserAdditionalTest(APITestCase):
         self.assertIn('user', response.json().keys())
         self.assertIn('user additional with this user already exists.', response.json().get('user'))
 
+    def test_duplicate_saved_sizes(self):
+        url = reverse('user_additional', kwargs={'id': self.user1.id})
+        data = {
+            'user': self.user1.id,
+            'genderInterested': 'W',
+            'weight': 60,
+            'height': 170,
+            'bustSize': 90,
+            'shoulderSize': 40,
+            'waistSize': 75,
+            'hipsSize': 95,
+            'inseam': 75,
+            'shoeSize': 38,
+            'savedSizes': [{'sizeCode': 'W-TOP:M'}],
+        }
+        duplicate_saved_sizes = [{'sizeCode': 'W-TOP:S'}, {'sizeCode': 'W-TOP:S'}]
+
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.post(url, data={**data, 'savedSizes': duplicate_saved_sizes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('savedSizes', response.json().keys())
+
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.patch(url, data={'savedSizes': duplicate_saved_sizes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(['W-TOP:M'], list(SavedSize.objects.values_list('size_code', flat=True)))
+
 
 class OTPTest(APITestCase):
     @classmethod
@@ -12,6 +12,7 @@ from django.contrib.auth import get_user_model
 
 from chicpic.settings.throttling import OncePerMinuteThrottle
 from chicpic.settings.permissions import IsAdminOrSelf
+from clothing.cache import invalidate_fit_profile
 
 from .models import UserAdditional
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserReadonlySerializer, \
@@ -103,3 +104,14 @@ class UserAdditionalView(CreateAPIView, UpdateAPIView):
     lookup_field = 'user__id'
     lookup_url_kwarg = 'id'
     queryset = UserAdditional.objects.all()
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalidate_fit_profile(serializer.instance)
+
+    def perform_update(self, serializer):
+        # Cached best-fit results are computed from the measurements of the user who requested them first, so the
+        # results of both the old and the new size profile of the user are dropped
+        invalidate_fit_profile(serializer.instance)
+        super().perform_update(serializer)
+        invalidate_fit_profile(serializer.instance)